@@ -4,22 +4,38 @@ eventlet.monkey_patch()
 
 import os
 import uuid
+import secrets
 import tempfile
 import requests  # Make sure requests is imported early
-from flask import Flask, request, render_template, jsonify, session, Response, redirect, url_for
+from flask import Flask, request, render_template, jsonify, session, Response
 import openai
+import cartesia
 import re
 from dotenv import load_dotenv
 import time
-import json
 from flask_socketio import SocketIO, emit, disconnect
+from flask_cors import CORS
+import contextlib
 import functools
+import itertools
+from dataclasses import dataclass
+import hashlib
 import io
+import logging
+import threading
+import orjson
+from flask.json.provider import JSONProvider
 from werkzeug.utils import secure_filename
 
+from eventlet.queue import Empty, Full, LightQueue
+
+from completion_cache import SemanticCompletionCache
+from tts_cache import AudioRecorder, TTSAudioCache
+
 # Import LangGraph components
 from graph import app as langgraph_app
 from nodes import GraphState
+from utils import mistral_client
 
 """
 Configuration Instructions:
@@ -43,8 +59,169 @@ Configuration Instructions:
 # Load environment variables from .env file
 load_dotenv()
 
+# Configure logging (set LOG_LEVEL=DEBUG for per-request diagnostics)
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
 # Initialize OpenAI API
 openai.api_key = os.getenv("OPENAI_API_KEY")
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that blocks callers until capacity is available.
+    Used to keep OpenAI calls under the account's rate limits instead of
+    failing with 429 errors during bursts.
+    """
+
+    def __init__(self, capacity, per_seconds=60.0):
+        self.capacity = capacity
+        self.refill_rate = capacity / per_seconds
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate)
+                self.last_refill = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait_time = (amount - self.tokens) / self.refill_rate
+            time.sleep(wait_time)
+
+# Requests-per-minute and tokens-per-minute limits for OpenAI calls
+openai_request_limiter = TokenBucket(int(os.getenv("OPENAI_RPM_LIMIT", "500")))
+openai_token_limiter = TokenBucket(int(os.getenv("OPENAI_TPM_LIMIT", "90000")))
+
+def create_chat_completion(**kwargs):
+    """Create an OpenAI chat completion once the rate limiters allow it"""
+    # Rough token estimate: ~4 characters per prompt token plus the completion budget
+    prompt_chars = sum(len(message['content']) for message in kwargs.get('messages', []))
+    openai_request_limiter.acquire()
+    openai_token_limiter.acquire(prompt_chars // 4 + kwargs.get('max_tokens', 0))
+    return openai.chat.completions.create(**kwargs)
+
+def create_transcription(**kwargs):
+    """Create a Whisper transcription once the request limiter allows it"""
+    openai_request_limiter.acquire()
+    return openai.audio.transcriptions.create(**kwargs)
+
+# Command and conversation chunks are transcribed with a model that supports
+# streaming (whisper-1 does not) so partial text reaches the client early
+STREAMING_TRANSCRIPTION_MODEL = os.getenv("STREAMING_TRANSCRIPTION_MODEL", "gpt-4o-mini-transcribe")
+# Cleared if the installed openai SDK can't stream transcriptions
+transcription_streaming_supported = True
+
+def stream_transcription_text(room, **kwargs):
+    """
+    Create a streaming transcription, forwarding each piece of text to the
+    Socket.IO room (if one is given) as a transcription_token event, and
+    return the full text.
+    Falls back to a regular whisper-1 transcription if streaming is unavailable.
+    """
+    global transcription_streaming_supported
+    if transcription_streaming_supported:
+        try:
+            response = create_transcription(stream=True, **kwargs)
+        except TypeError as e:
+            logger.warning("Streaming transcription not supported by the openai SDK: %s", e)
+            transcription_streaming_supported = False
+        except openai.BadRequestError as e:
+            logger.warning("Streaming transcription rejected, retrying without streaming: %s", e)
+        else:
+            return collect_transcription_stream(room, response)
+    
+    kwargs['model'] = "whisper-1"
+    return create_transcription(**kwargs).text.strip()
+
+def collect_transcription_stream(room, response):
+    """Forward streamed transcription deltas to the room and return the full text"""
+    parts = []
+    for event in response:
+        if event.type == "transcript.text.delta":
+            parts.append(event.delta)
+            if room:
+                socketio.emit('transcription_token', {'delta': event.delta}, room=room)
+        elif event.type == "transcript.text.done":
+            return event.text.strip()
+    return "".join(parts).strip()
+
+def create_embedding(text):
+    """Create an OpenAI embedding once the rate limiters allow it"""
+    openai_request_limiter.acquire()
+    openai_token_limiter.acquire(len(text) // 4)
+    response = openai.embeddings.create(model="text-embedding-3-small", input=text)
+    return response.data[0].embedding
+
+# Completions reused for identical or near-identical prompts
+completion_cache = SemanticCompletionCache(create_embedding)
+
+def requesting_socket_room(session_id):
+    """
+    Return the sid of the socket the current request was sent from, so
+    streamed tokens only reach the tab that is waiting for them, or None if
+    it is missing or not authenticated for session_id.
+    """
+    sid = request.form.get('socket_id') or (request.get_json(silent=True) or {}).get('socket_id')
+    socket_session = socket_sessions.get(sid) if sid else None
+    if socket_session is None or socket_session.session_id != session_id:
+        return None
+    return sid
+
+def stream_completion_text(room, **kwargs):
+    """
+    Create a streaming chat completion, forwarding each token to the
+    Socket.IO room as a chat_token event, and return the full text.
+    """
+    response = create_chat_completion(stream=True, **kwargs)
+    parts = []
+    for chunk in response:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            socketio.emit('chat_token', {'delta': delta}, room=room)
+    return "".join(parts).strip()
+
+def cached_completion_text(cache_scope, similarity_text, stream_room=None, **kwargs):
+    """
+    Return the text of a chat completion, reusing an earlier response from the
+    same cache scope when the request is identical or similarity_text is a
+    near-duplicate of an earlier one. Pass similarity_text=None to only reuse
+    identical requests. On a miss the completion is streamed to stream_room
+    if one is given.
+    """
+    request_key = hashlib.sha256(orjson.dumps(kwargs, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    embedding = None
+    try:
+        cached_text, embedding = completion_cache.lookup(cache_scope, request_key, similarity_text)
+        if cached_text is not None:
+            logger.debug("Completion cache hit for scope %s", cache_scope)
+            return cached_text
+    except Exception as e:
+        logger.warning("Completion cache lookup failed: %s", e)
+    
+    if stream_room:
+        text = stream_completion_text(stream_room, **kwargs)
+    else:
+        response = create_chat_completion(**kwargs)
+        text = response.choices[0].message.content.strip()
+    
+    try:
+        completion_cache.store(cache_scope, request_key, similarity_text, text, embedding)
+    except Exception as e:
+        logger.warning("Completion cache store failed: %s", e)
+    return text
+
 # Initialize Cartesia API key
 CARTESIA_API_KEY = os.getenv("CARTESIA_API_KEY", "")
 # Initialize Mistral API key
@@ -52,12 +229,134 @@ MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "")
 
 # Check and log API availability
 if not CARTESIA_API_KEY:
-    print("WARNING: Cartesia API key not found. Text-to-speech will not work.")
+    logger.warning("Cartesia API key not found. Text-to-speech will not work.")
+    cartesia_client = None
 else:
-    print("Cartesia API key loaded successfully.")
+    logger.info("Cartesia API key loaded successfully.")
+    # Shared client so requests reuse its connection pool
+    cartesia_client = cartesia.Cartesia(api_key=CARTESIA_API_KEY)
+
+# Recently synthesized (or prefetched) speech is kept in memory for a few
+# minutes and on disk until TTS_CACHE_MAX_MB is reached
+tts_audio_cache = TTSAudioCache(
+    cache_dir=os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "active_recall_tts")),
+    max_disk_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "100")) * 1024 * 1024
+)
+
+# Streamed audio longer than this is sent without being kept in the cache
+TTS_CACHE_MAX_BYTES = 1024 * 1024
+
+# Every synthesis path requests the same format, since they share cache
+# entries and all serve them as audio/mpeg
+TTS_OUTPUT_FORMAT = {"container": "mp3", "sample_rate": 44100}
+
+def cartesia_voice(voice_id):
+    """Create properly formatted voice parameter"""
+    if isinstance(voice_id, str):
+        return {
+            "mode": "id",
+            "id": voice_id
+        }
+    return voice_id
+
+def synthesize_speech(text, voice_id, model_id):
+    """Return MP3 bytes for text, reusing cached audio when available"""
+    voice = cartesia_voice(voice_id)
+    audio_data = tts_audio_cache.get(text, voice, model_id)
+    if audio_data is not None:
+        logger.debug("TTS cache hit for: '%s...'", text[:50])
+        return audio_data
+    
+    audio_generator = cartesia_client.tts.bytes(
+        transcript=text,
+        model_id=model_id,
+        voice=voice,
+        language="en",
+        output_format=TTS_OUTPUT_FORMAT
+    )
+    
+    # Combine all chunks into a single audio output
+    audio_data = b"".join(audio_generator)
+    tts_audio_cache.set(text, voice, model_id, audio_data)
+    return audio_data
+
+def stream_speech(text, voice_id, model_id):
+    """
+    Return an iterable of MP3 parts for text without holding the whole clip
+    in memory. Cached audio is returned as a single part.
+    """
+    voice = cartesia_voice(voice_id)
+    audio_data = tts_audio_cache.get(text, voice, model_id)
+    if audio_data is not None:
+        logger.debug("TTS cache hit for: '%s...'", text[:50])
+        return [audio_data]
+    
+    audio_chunks = iter(cartesia_client.tts.bytes(
+        transcript=text,
+        model_id=model_id,
+        voice=voice,
+        language="en",
+        output_format=TTS_OUTPUT_FORMAT
+    ))
+    # Fetch the first chunk now so API errors surface before the response starts
+    first_chunk = next(audio_chunks, b"")
+    return buffer_speech_chunks(text, voice, model_id, itertools.chain([first_chunk], audio_chunks))
+
+def buffer_speech_chunks(text, voice, model_id, audio_chunks):
+    """
+    Yield audio in parts of at least TTS_STREAM_FLUSH_BYTES, caching the
+    complete clip if it is no larger than TTS_CACHE_MAX_BYTES.
+    """
+    recorder = AudioRecorder(tts_audio_cache, text, voice, model_id, TTS_CACHE_MAX_BYTES)
+    audio_buffer = bytearray()
+    for chunk in itertools.chain(audio_chunks, [None]):
+        if chunk:
+            audio_buffer.extend(chunk)
+        if audio_buffer and (chunk is None or len(audio_buffer) >= TTS_STREAM_FLUSH_BYTES):
+            part = bytes(audio_buffer)
+            audio_buffer.clear()
+            recorder.add(part)
+            yield part
+    recorder.finish()
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson for faster response encoding"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response instead of decoding
+        # them to str and having Werkzeug encode them again
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),
+            mimetype="application/json"
+        )
+
+class ORJSONSocketSerializer:
+    """orjson wrapper with the json module interface python-socketio expects"""
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+
+# Speech synthesis can be used from other origins; Flask-CORS answers the
+# preflight requests and adds the CORS headers to the responses
+CORS(app, resources={
+    r"/text-to-speech(/stream|/process-queue)?$": {"origins": "*"}
+}, max_age=86400)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", os.urandom(24).hex())
 
 # Configure secure cookies for HTTPS
@@ -65,28 +364,197 @@ app.config['SESSION_COOKIE_SECURE'] = True  # Only send cookies over HTTPS
 app.config['SESSION_COOKIE_HTTPONLY'] = True  # Prevent JavaScript access to cookies
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'  # SameSite protection
 
-# Store chat sessions (in-memory for simplicity - would use a database in production)
-chat_sessions = {}
+# Store chat sessions in Redis when REDIS_URL is set so they can be shared
+# between worker processes, otherwise keep them in process memory
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    import redis
+    from session_store import RedisSessionStore
+    chat_sessions = RedisSessionStore(redis.Redis.from_url(REDIS_URL))
+
+    @app.teardown_request
+    def flush_chat_sessions(exc):
+        chat_sessions.flush()
+else:
+    chat_sessions = {}
+
+# Only the most recent entries are kept so sessions stay a bounded size
+MAX_SESSION_MESSAGES = 50
+MAX_QUESTION_HISTORY = 200
+MAX_TRANSCRIPTION_HISTORY = 200
+# Committed words are only kept to prompt the next transcription pass
+MAX_COMMITTED_WORDS = 50
+MAX_TTS_QUEUE_LENGTH = 32
+
+# Audio of the current segment of each session's utterance in
+# continuous/dictation mode. It is binary and only read by the worker
+# receiving the chunks, so it is kept in process memory instead of in the
+# session. The client restarts its recorder every few chunks to start a new
+# segment, so each transcription pass only re-sends the current segment; the
+# cap only guards against clients that never do.
+utterance_audio = {}
+MAX_SEGMENT_AUDIO_BYTES = 2 * 1024 * 1024
+
+def append_capped(items, item, limit):
+    """Append item to a session list, dropping the oldest entries past limit"""
+    items.append(item)
+    if len(items) > limit:
+        del items[:-limit]
+
+def extend_capped(items, new_items, limit):
+    """Extend a session list, dropping the oldest entries past limit"""
+    items.extend(new_items)
+    if len(items) > limit:
+        del items[:-limit]
+
+def new_chat_session():
+    """Return the initial state for a fresh chat session"""
+    return {
+        'messages': [],
+        'current_topic': None,
+        'generated_questions': []
+    }
 
 # Initialize SocketIO with Flask app
 socketio = SocketIO(app, 
                    cors_allowed_origins="*", 
                    async_mode='eventlet',
-                   logger=True,
-                   engineio_logger=True)
-
-# Authenticated socket sessions
+                   message_queue=REDIS_URL,
+                   json=ORJSONSocketSerializer,
+                   logger=logger.isEnabledFor(logging.DEBUG),
+                   engineio_logger=logger.isEnabledFor(logging.DEBUG))
+
+@dataclass
+class SocketSession:
+    """An authenticated Socket.IO connection"""
+    __slots__ = ('session_id', 'authenticated_at', 'token', 'type')
+    session_id: str
+    authenticated_at: float
+    token: str
+    type: str
+
+# Authenticated socket sessions, keyed by socket id. These never leave the
+# process, unlike chat_sessions which stay plain dicts so they can be stored
+# as JSON and returned to the client as-is.
 socket_sessions = {}
 
 def authenticated_only(f):
+    """
+    Disconnect unauthenticated sockets, otherwise call the handler with the
+    socket's SocketSession as its first argument.
+    """
     @functools.wraps(f)
     def wrapped(*args, **kwargs):
-        if request.sid not in socket_sessions:
+        socket_session = socket_sessions.get(request.sid)
+        if socket_session is None:
             disconnect()
             return False
-        return f(*args, **kwargs)
+        return f(socket_session, *args, **kwargs)
     return wrapped
 
+# Audio in streaming TTS responses is written out once this much is
+# buffered, or once the oldest buffered audio has waited this long
+TTS_STREAM_FLUSH_BYTES = 32 * 1024
+TTS_STREAM_FLUSH_INTERVAL = 0.05
+
+# Multipart framing for streamed audio, prebuilt so each part is written
+# with a single yield
+AUDIO_FRAME_HEADER = b'--frame\r\nContent-Type: audio/mpeg\r\n\r\n'
+AUDIO_FRAME_SEPARATOR = b'\r\n' + AUDIO_FRAME_HEADER
+# Streamed audio is generated per request and must not be cached
+STREAM_RESPONSE_HEADERS = {
+    'Cache-Control': 'no-cache, no-store, must-revalidate',
+    'Pragma': 'no-cache',
+    'Expires': '0'
+}
+
+# A sentence runs up to terminal punctuation followed by whitespace, or to
+# the end of the text
+SENTENCE_PATTERN = re.compile(r'\S.*?(?:[.!?](?=\s)|$)', re.DOTALL)
+
+def iter_sentences(text):
+    """Lazily yield the sentences of text for streaming TTS"""
+    for match in SENTENCE_PATTERN.finditer(text):
+        yield match.group()
+
+# Upper bound on audio chunks waiting between the Cartesia websocket and
+# the response, and how long either side waits for the other
+TTS_PIPELINE_MAX_CHUNKS = 256
+TTS_PIPELINE_TIMEOUT = 30
+
+def stream_sentence_audio(text, voice_param, model_id, context_id):
+    """
+    Yield raw audio chunks for text from a single Cartesia websocket context,
+    with None after each sentence. A background task sends the sentences and
+    queues their audio, so the next sentence is requested as soon as the
+    previous one has been received rather than once it has been written to
+    the client.
+    """
+    audio_queue = LightQueue(TTS_PIPELINE_MAX_CHUNKS)
+    finished = object()
+    # Set once the consumer stops reading, e.g. because the client disconnected
+    cancelled = threading.Event()
+    
+    def synthesize():
+        try:
+            # Create websocket client from SDK
+            ws_client = cartesia_client.tts.websocket()
+            
+            # Split text into sentences lazily so the first one is sent
+            # to Cartesia without waiting for the rest of the text
+            for i, sentence in enumerate(iter_sentences(text)):
+                if cancelled.is_set():
+                    return
+                if i > 0:
+                    logger.debug("Continuing with sentence %s", i + 1)
+                    # Use getattr to avoid conflict with Python's 'continue' keyword
+                    continue_method = getattr(ws_client, "continue")
+                    audio_chunks = continue_method({
+                        "contextId": context_id,
+                        "transcript": sentence
+                    })
+                else:
+                    logger.debug("Starting stream with first sentence: '%s'", sentence)
+                    audio_chunks = ws_client.send({
+                        "contextId": context_id,
+                        "modelId": model_id,
+                        "voice": voice_param,
+                        "transcript": sentence,
+                        "language": "en",
+                        "output_format": TTS_OUTPUT_FORMAT
+                    })
+                
+                for chunk in audio_chunks:
+                    if cancelled.is_set():
+                        logger.debug("Streamed TTS response closed, cancelling synthesis")
+                        return
+                    if chunk.type == "chunk" and getattr(chunk, 'chunk', None):
+                        audio_queue.put(chunk.chunk, timeout=TTS_PIPELINE_TIMEOUT)
+                audio_queue.put(None, timeout=TTS_PIPELINE_TIMEOUT)
+            audio_queue.put(finished, timeout=TTS_PIPELINE_TIMEOUT)
+        except Full:
+            logger.warning("Client stopped reading streamed TTS, cancelling synthesis")
+        except Exception as e:
+            audio_queue.put(e, timeout=TTS_PIPELINE_TIMEOUT)
+    
+    socketio.start_background_task(synthesize)
+    try:
+        while True:
+            try:
+                item = audio_queue.get(timeout=TTS_PIPELINE_TIMEOUT)
+            except Empty:
+                raise TimeoutError("Timed out waiting for synthesized audio")
+            if item is finished:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+        # Free the queue so a producer blocked on put() sees the flag promptly
+        while not audio_queue.empty():
+            audio_queue.get_nowait()
+
 # Define allowed file extensions and max file size
 ALLOWED_EXTENSIONS = {'pdf'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
@@ -97,22 +565,21 @@ def allowed_file(filename):
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
-    print(f"Client connected: {request.sid}")
+    logger.debug("Client connected: %s", request.sid)
     emit('connection_status', {'status': 'connected', 'sid': request.sid})
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
-    print(f"Client disconnected: {request.sid}")
-    if request.sid in socket_sessions:
-        print(f"Removing authenticated session for {request.sid}")
-        del socket_sessions[request.sid]
+    logger.debug("Client disconnected: %s", request.sid)
+    if socket_sessions.pop(request.sid, None) is not None:
+        logger.debug("Removed authenticated session for %s", request.sid)
 
 @socketio.on('authenticate')
 def handle_authentication(data):
     """Handle client authentication"""
     try:
-        print(f"Authentication attempt from {request.sid}")
+        logger.debug("Authentication attempt from %s", request.sid)
         token = data.get('token')
         session_id = data.get('session_id')
         
@@ -123,47 +590,47 @@ def handle_authentication(data):
             })
             return
             
-        # Verify token and session
-        if session_id in chat_sessions and 'websocket_tokens' in chat_sessions[session_id]:
-            tokens = chat_sessions[session_id]['websocket_tokens']
-            
-            if token in tokens:
-                token_data = tokens[token]
-                
-                # Check token expiry
-                if token_data['expires_at'] < time.time():
-                    emit('authentication_status', {
-                        'status': 'error',
-                        'message': 'Token expired'
-                    })
-                    return
-                    
-                # Store authenticated session
-                socket_sessions[request.sid] = {
-                    'session_id': session_id,
-                    'authenticated_at': time.time(),
-                    'token': token,
-                    'type': token_data['type']
-                }
-                
-                print(f"Client {request.sid} authenticated for session {session_id}")
-                
-                # Success response
+        # Verify token and session with a single lookup per level. Expiry
+        # stays on the wall clock since tokens are stored with the session,
+        # which may be shared between worker processes through Redis.
+        session_data = chat_sessions.get(session_id) or {}
+        token_data = session_data.get('websocket_tokens', {}).get(token)
+        
+        if token_data is not None:
+            # Check token expiry
+            if token_data['expires_at'] < time.time():
                 emit('authentication_status', {
-                    'status': 'success',
-                    'message': 'Authenticated successfully',
-                    'session_id': session_id
+                    'status': 'error',
+                    'message': 'Token expired'
                 })
-                
-                # Join room for this session
-                from flask_socketio import join_room
-                join_room(session_id)
-                
-                # Send initial state
-                emit('ui_state_update', chat_sessions[session_id].get('ui_state', {}))
-                
                 return
                 
+            # Store authenticated session
+            socket_sessions[request.sid] = SocketSession(
+                session_id=session_id,
+                authenticated_at=time.time(),
+                token=token,
+                type=token_data['type']
+            )
+            
+            logger.debug("Client %s authenticated for session %s", request.sid, session_id)
+            
+            # Success response
+            emit('authentication_status', {
+                'status': 'success',
+                'message': 'Authenticated successfully',
+                'session_id': session_id
+            })
+            
+            # Join room for this session
+            from flask_socketio import join_room
+            join_room(session_id)
+            
+            # Send initial state
+            emit('ui_state_update', session_data.get('ui_state', {}))
+            
+            return
+            
         # If we get here, authentication failed
         emit('authentication_status', {
             'status': 'error',
@@ -171,7 +638,7 @@ def handle_authentication(data):
         })
         
     except Exception as e:
-        print(f"Error in authentication: {str(e)}")
+        logger.error("Error in authentication: %s", e)
         emit('authentication_status', {
             'status': 'error',
             'message': f'Authentication error: {str(e)}'
@@ -179,44 +646,122 @@ def handle_authentication(data):
 
 @socketio.on('ui_state_request')
 @authenticated_only
-def handle_ui_state_request():
+def handle_ui_state_request(socket_session):
     """Send current UI state to client"""
-    session_id = socket_sessions[request.sid]['session_id']
+    session_id = socket_session.session_id
     ui_state = chat_sessions[session_id].get('ui_state', {})
     emit('ui_state_update', ui_state)
 
 @socketio.on('question_state_request')
 @authenticated_only
-def handle_question_state_request():
+def handle_question_state_request(socket_session):
     """Send current question state to client"""
-    session_id = socket_sessions[request.sid]['session_id']
-    
-    question_state = chat_sessions[session_id].get('question_state', {})
-    questions = chat_sessions[session_id].get('generated_questions', [])
+    session_id = socket_session.session_id
+    emit('question_state_update', build_question_state_payload(chat_sessions[session_id]))
+
+@socketio.on('tts_status_request')
+@authenticated_only
+def handle_tts_status_request(socket_session):
+    """Send current TTS status to client"""
+    session_id = socket_session.session_id
+    emit('tts_status_update', build_tts_status_payload(chat_sessions[session_id]))
+
+def build_question_state_payload(session_data):
+    """Build the question_state_update payload for a session"""
+    question_state = session_data.get('question_state', {})
+    questions = session_data.get('generated_questions', [])
     
     current_index = question_state.get('current_index', 0)
     current_question = questions[current_index] if questions and current_index < len(questions) else None
     
-    emit('question_state_update', {
+    return {
         'question_state': question_state,
         'current_question': current_question,
         'total_questions': len(questions)
-    })
+    }
 
-@socketio.on('tts_status_request')
-@authenticated_only
-def handle_tts_status_request():
-    """Send current TTS status to client"""
-    session_id = socket_sessions[request.sid]['session_id']
-    
-    tts_queue = chat_sessions[session_id].get('tts_queue', [])
-    active_tts = chat_sessions[session_id].get('active_tts')
+# Queued TTS requests are kept in one list per priority so enqueueing never
+# has to scan the queue. High priority requests play newest first, so that
+# bucket is consumed from its end.
+def new_tts_queue():
+    """Return an empty TTS queue"""
+    return {'high': [], 'normal': [], 'low': []}
+
+def tts_queue_items(tts_queue):
+    """Return the queued requests in the order they will be played"""
+    return tts_queue['high'][::-1] + tts_queue['normal'] + tts_queue['low']
+
+def tts_queue_length(tts_queue):
+    return len(tts_queue['high']) + len(tts_queue['normal']) + len(tts_queue['low'])
+
+def pop_tts_request(tts_queue):
+    """Remove and return the next request to play, or None if the queue is empty"""
+    if tts_queue['high']:
+        return tts_queue['high'].pop()
+    for priority in ('normal', 'low'):
+        if tts_queue[priority]:
+            return tts_queue[priority].pop(0)
+    return None
+
+def build_tts_status_payload(session_data):
+    """Build the tts_status_update payload for a session"""
+    tts_queue = session_data.get('tts_queue_buckets', new_tts_queue())
+    active_tts = session_data.get('active_tts')
     
-    emit('tts_status_update', {
-        'queue_length': len(tts_queue),
+    return {
+        'queue_length': tts_queue_length(tts_queue),
         'is_playing': active_tts is not None,
         'active': active_tts
-    })
+    }
+
+# State updates emitted to the same room within this window are sent
+# together as a single 'batch' event
+SOCKET_BATCH_INTERVAL = 0.01
+
+pending_room_events = {}
+pending_room_events_lock = threading.Lock()
+
+def emit_to_room(event, payload, room):
+    """Queue an event for the room, flushing it after SOCKET_BATCH_INTERVAL"""
+    with pending_room_events_lock:
+        events = pending_room_events.get(room)
+        schedule_flush = events is None
+        if schedule_flush:
+            events = pending_room_events[room] = []
+        events.append([event, payload])
+    if schedule_flush:
+        socketio.start_background_task(flush_room_events, room)
+
+def flush_room_events(room):
+    """Send the room's queued events, as one frame when there are several"""
+    socketio.sleep(SOCKET_BATCH_INTERVAL)
+    with pending_room_events_lock:
+        events = pending_room_events.pop(room, [])
+    if len(events) == 1:
+        socketio.emit(events[0][0], events[0][1], room=room)
+    elif events:
+        socketio.emit('batch', events, room=room)
+
+# State changes are broadcast once to the session's room (joined on
+# authentication) so every connected tab gets a single shared payload
+def broadcast_ui_state(session_id):
+    """Push the session's UI state to all of its sockets"""
+    emit_to_room('ui_state_update', chat_sessions[session_id].get('ui_state', {}), session_id)
+
+def broadcast_question_state(session_id):
+    """Push the session's question state to all of its sockets"""
+    emit_to_room('question_state_update', build_question_state_payload(chat_sessions[session_id]), session_id)
+
+def broadcast_tts_status(session_id):
+    """Push the session's TTS queue status to all of its sockets"""
+    emit_to_room('tts_status_update', build_tts_status_payload(chat_sessions[session_id]), session_id)
+
+def prefetch_question_tts(text, voice_id, model_id):
+    """Synthesize a question in the background so it is cached before it is spoken"""
+    try:
+        synthesize_speech(text, voice_id, model_id)
+    except Exception as e:
+        logger.warning("TTS prefetch failed: %s", e)
 
 @app.route('/')
 def index():
@@ -224,11 +769,7 @@ def index():
     if 'session_id' not in session:
         session['session_id'] = str(uuid.uuid4())
         # Initialize a new chat session
-        chat_sessions[session['session_id']] = {
-            'messages': [],
-            'current_topic': None,
-            'generated_questions': []
-        }
+        chat_sessions[session['session_id']] = new_chat_session()
     return render_template('index.html')
 
 @app.route('/upload-pdf', methods=['POST'])
@@ -262,15 +803,10 @@ def upload_pdf():
         pdf_stream = io.BytesIO(file.read())
         
         # Initialize session if needed
-        if session_id not in chat_sessions:
-            chat_sessions[session_id] = {
-                'messages': [],
-                'current_topic': None,
-                'generated_questions': []
-            }
+        session_data = chat_sessions.setdefault(session_id, new_chat_session())
             
         # Update UI state to show processing
-        chat_sessions[session_id]['ui_state'] = {
+        session_data['ui_state'] = {
             'is_processing_pdf': True,
             'pdf_filename': secure_filename(file.filename)
         }
@@ -281,7 +817,7 @@ def upload_pdf():
         
         # Check for errors in the result
         if result.get('error'):
-            chat_sessions[session_id]['ui_state'] = {
+            session_data['ui_state'] = {
                 'is_processing_pdf': False,
                 'pdf_error': result['error']
             }
@@ -290,7 +826,7 @@ def upload_pdf():
         # Extract generated questions from result
         generated_questions = result.get('generated_questions', [])
         if not generated_questions:
-            chat_sessions[session_id]['ui_state'] = {
+            session_data['ui_state'] = {
                 'is_processing_pdf': False,
                 'pdf_error': 'No questions could be generated from this PDF'
             }
@@ -301,36 +837,31 @@ def upload_pdf():
         topic = f"PDF: {filename_without_ext}"
         
         # Update session with questions and topic
-        chat_sessions[session_id]['current_topic'] = topic
-        chat_sessions[session_id]['generated_questions'] = generated_questions
-        chat_sessions[session_id]['question_state'] = {
+        session_data['current_topic'] = topic
+        session_data['generated_questions'] = generated_questions
+        session_data['question_state'] = {
             'current_index': 0,
             'total': len(generated_questions),
             'source': 'pdf'
         }
         
         # Update UI state to show completion
-        chat_sessions[session_id]['ui_state'] = {
+        session_data['ui_state'] = {
             'is_processing_pdf': False,
             'pdf_processed': True,
             'pdf_filename': secure_filename(file.filename)
         }
         
-        # Emit socket event if socket is connected
-        if session_id in socket_sessions:
-            socketio.emit('ui_state_update', chat_sessions[session_id]['ui_state'], room=session_id)
-            socketio.emit('question_state_update', {
-                'question_state': chat_sessions[session_id]['question_state'],
-                'current_question': generated_questions[0],
-                'total_questions': len(generated_questions)
-            }, room=session_id)
+        # Notify connected sockets for this session
+        broadcast_ui_state(session_id)
+        broadcast_question_state(session_id)
         
         # Add system message to chat
         bot_message = {
             'role': 'assistant',
             'content': f"I've analyzed your PDF and generated {len(generated_questions)} questions for active recall practice. Let's begin with the first question."
         }
-        chat_sessions[session_id]['messages'].append(bot_message)
+        append_capped(session_data['messages'], bot_message, MAX_SESSION_MESSAGES)
         
         return jsonify({
             'success': True,
@@ -340,16 +871,15 @@ def upload_pdf():
         })
         
     except Exception as e:
-        print(f"Error processing PDF: {str(e)}")
+        logger.error("Error processing PDF: %s", e)
         # Update UI state to show error
         if session_id in chat_sessions:
             chat_sessions[session_id]['ui_state'] = {
                 'is_processing_pdf': False,
                 'pdf_error': f"Error processing PDF: {str(e)}"
             }
-            # Emit socket event if socket is connected
-            if session_id in socket_sessions:
-                socketio.emit('ui_state_update', chat_sessions[session_id]['ui_state'], room=session_id)
+            # Notify connected sockets for this session
+            broadcast_ui_state(session_id)
                 
         return jsonify({'error': f"Error processing PDF: {str(e)}"}), 500
 
@@ -365,20 +895,13 @@ def chat():
             return jsonify({'error': 'Invalid session or empty message'}), 400
         
         # Get or initialize session data
-        if session_id not in chat_sessions:
-            chat_sessions[session_id] = {
-                'messages': [],
-                'current_topic': None,
-                'generated_questions': []
-            }
-        
-        session_data = chat_sessions[session_id]
+        session_data = chat_sessions.setdefault(session_id, new_chat_session())
         
         # Add user message to chat history
-        session_data['messages'].append({
+        append_capped(session_data['messages'], {
             'role': 'user',
             'content': user_message
-        })
+        }, MAX_SESSION_MESSAGES)
         
         # Determine the state of conversation and next steps
         if session_data['current_topic'] is None:
@@ -389,7 +912,10 @@ def chat():
             response_message, response_text = handle_ongoing_conversation(user_message, session_data)
             
         # Add assistant's response to chat history
-        session_data['messages'].append(response_message)
+        append_capped(session_data['messages'], response_message, MAX_SESSION_MESSAGES)
+        
+        # Topic, difficulty or answer changes update the question state
+        broadcast_question_state(session_id)
         
         return jsonify({
             'response': response_text,
@@ -400,16 +926,79 @@ def chat():
     except openai.APIError as e:
         # Handle OpenAI API-specific errors
         error_message = f"OpenAI API error: {str(e)}"
-        print(error_message)
+        logger.error(error_message)
         return jsonify({'error': 'There was an issue connecting to the AI service. Please try again later.'}), 503
     except openai.RateLimitError as e:
-        print(f"OpenAI rate limit error: {str(e)}")
+        logger.warning("OpenAI rate limit error: %s", e)
         return jsonify({'error': 'The AI service is currently experiencing high demand. Please try again in a moment.'}), 429
     except Exception as e:
         error_message = f"Error in chat endpoint: {str(e)}"
-        print(error_message)
+        logger.error(error_message)
         return jsonify({'error': 'An error occurred processing your message. Please try again or try a different topic.'}), 500
 
+def get_question_state(session_id):
+    """Return the session's question state, initializing it if not present"""
+    session_data = chat_sessions[session_id]
+    if 'question_state' not in session_data:
+        session_data['question_state'] = {
+            'current_index': 0,
+            'answered_questions': [],
+            'skipped_questions': [],
+            'correct_count': 0,
+            'partially_correct_count': 0,
+            'incorrect_count': 0,
+            'last_answer_evaluation': None,
+            'mastery_level': 0.0,  # 0.0-1.0 scale
+            'question_history': []
+        }
+    return session_data['question_state']
+
+def advance_to_next_question(session_id):
+    """Move the session to its next question and return the JSON response"""
+    session_data = chat_sessions[session_id]
+    question_state = get_question_state(session_id)
+    questions = session_data.get('generated_questions', [])
+    if not questions:
+        return jsonify({'error': 'No questions available'}), 400
+        
+    # Update current index (wrap around if at the end)
+    current_index = question_state['current_index']
+    new_index = (current_index + 1) % len(questions)
+    question_state['current_index'] = new_index
+    
+    # Get the next question
+    next_question = questions[new_index]
+    
+    # Add to question history
+    append_capped(question_state['question_history'], {
+        'question_index': new_index,
+        'question': next_question,
+        'timestamp': time.time()
+    }, MAX_QUESTION_HISTORY)
+    
+    # Add the question to the chat history
+    append_capped(session_data['messages'], {
+        'role': 'assistant',
+        'content': f"Let's try this question: {next_question}"
+    }, MAX_SESSION_MESSAGES)
+    
+    broadcast_question_state(session_id)
+    
+    # Synthesize the question while the client renders it, if it will be read aloud
+    tts_preferences = session_data.get('tts_preferences', {})
+    if cartesia_client and tts_preferences.get('auto_read'):
+        voice = cartesia_voice(tts_preferences.get('voice_id', 'nova'))
+        model_id = tts_preferences.get('model_id', 'sonic-2')
+        if not tts_audio_cache.has(next_question, voice, model_id):
+            socketio.start_background_task(prefetch_question_tts, next_question, voice, model_id)
+    
+    return jsonify({
+        'question': next_question,
+        'index': new_index,
+        'total': len(questions),
+        'success': True
+    })
+
 @app.route('/questions/state', methods=['GET', 'POST'])
 def manage_question_state():
     """
@@ -417,29 +1006,16 @@ def manage_question_state():
     """
     try:
         session_id = session.get('session_id')
-        if not session_id:
+        session_data = chat_sessions.get(session_id) if session_id else None
+        if session_data is None:
             return jsonify({'error': 'Invalid session'}), 400
             
-        # Initialize question state if not present
-        if 'question_state' not in chat_sessions.get(session_id, {}):
-            chat_sessions[session_id]['question_state'] = {
-                'current_index': 0,
-                'answered_questions': [],
-                'skipped_questions': [],
-                'correct_count': 0,
-                'partially_correct_count': 0,
-                'incorrect_count': 0,
-                'last_answer_evaluation': None,
-                'mastery_level': 0.0,  # 0.0-1.0 scale
-                'question_history': []
-            }
-        
-        question_state = chat_sessions[session_id]['question_state']
+        question_state = get_question_state(session_id)
         
         # Handle GET request - return current question state
         if request.method == 'GET':
             # Also include the actual questions
-            questions = chat_sessions[session_id].get('generated_questions', [])
+            questions = session_data.get('generated_questions', [])
             current_question = questions[question_state['current_index']] if questions and question_state['current_index'] < len(questions) else None
             
             return jsonify({
@@ -460,43 +1036,11 @@ def manage_question_state():
             action = data.get('action', 'update')
             
             if action == 'next':
-                # Move to the next question
-                questions = chat_sessions[session_id].get('generated_questions', [])
-                if not questions:
-                    return jsonify({'error': 'No questions available'}), 400
-                    
-                # Update current index (wrap around if at the end)
-                current_index = question_state['current_index']
-                new_index = (current_index + 1) % len(questions)
-                question_state['current_index'] = new_index
-                
-                # Get the next question
-                next_question = questions[new_index]
-                
-                # Add to question history
-                question_state['question_history'].append({
-                    'question_index': new_index,
-                    'question': next_question,
-                    'timestamp': time.time()
-                })
-                
-                # Add the question to the chat history
-                session_data = chat_sessions[session_id]
-                session_data['messages'].append({
-                    'role': 'assistant',
-                    'content': f"Let's try this question: {next_question}"
-                })
-                
-                return jsonify({
-                    'question': next_question,
-                    'index': new_index,
-                    'total': len(questions),
-                    'success': True
-                })
+                return advance_to_next_question(session_id)
                 
             elif action == 'previous':
                 # Move to the previous question
-                questions = chat_sessions[session_id].get('generated_questions', [])
+                questions = session_data.get('generated_questions', [])
                 if not questions:
                     return jsonify({'error': 'No questions available'}), 400
                     
@@ -509,18 +1053,19 @@ def manage_question_state():
                 prev_question = questions[new_index]
                 
                 # Add to question history
-                question_state['question_history'].append({
+                append_capped(question_state['question_history'], {
                     'question_index': new_index,
                     'question': prev_question,
                     'timestamp': time.time()
-                })
+                }, MAX_QUESTION_HISTORY)
                 
                 # Add the question to the chat history
-                session_data = chat_sessions[session_id]
-                session_data['messages'].append({
+                append_capped(session_data['messages'], {
                     'role': 'assistant',
                     'content': f"Let's go back to this question: {prev_question}"
-                })
+                }, MAX_SESSION_MESSAGES)
+                
+                broadcast_question_state(session_id)
                 
                 return jsonify({
                     'question': prev_question,
@@ -535,7 +1080,7 @@ def manage_question_state():
                 if not answer:
                     return jsonify({'error': 'No answer provided'}), 400
                     
-                questions = chat_sessions[session_id].get('generated_questions', [])
+                questions = session_data.get('generated_questions', [])
                 if not questions:
                     return jsonify({'error': 'No questions available'}), 400
                     
@@ -546,19 +1091,11 @@ def manage_question_state():
                 current_question = questions[current_index]
                 
                 # Generate feedback using AI
-                session_data = chat_sessions[session_id]
-                feedback = generate_feedback_or_hint(answer, session_data)
+                _, feedback = generate_feedback_or_hint(answer, session_data)
                 
                 # Analyze the feedback to determine correctness (this could be made more sophisticated)
-                evaluation = 'incorrect'
-                if 'correct' in feedback.lower() and not ('not correct' in feedback.lower() or 'incorrect' in feedback.lower()):
-                    evaluation = 'correct'
-                    question_state['correct_count'] += 1
-                elif 'partially' in feedback.lower() or 'partly' in feedback.lower():
-                    evaluation = 'partially_correct'
-                    question_state['partially_correct_count'] += 1
-                else:
-                    question_state['incorrect_count'] += 1
+                evaluation = classify_feedback(feedback)
+                question_state[f'{evaluation}_count'] += 1
                 
                 # Update question state
                 question_state['last_answer_evaluation'] = {
@@ -581,6 +1118,8 @@ def manage_question_state():
                     weighted_score = question_state['correct_count'] + (question_state['partially_correct_count'] * 0.5)
                     question_state['mastery_level'] = round(weighted_score / total_answers, 2)
                 
+                broadcast_question_state(session_id)
+                
                 return jsonify({
                     'feedback': feedback,
                     'evaluation': evaluation,
@@ -599,6 +1138,8 @@ def manage_question_state():
                     if field in data:
                         question_state[field] = data[field]
                 
+                broadcast_question_state(session_id)
+                
                 return jsonify({
                     'question_state': question_state,
                     'success': True
@@ -609,7 +1150,7 @@ def manage_question_state():
                 
     except Exception as e:
         error_msg = f"Error in manage_question_state: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             'error': error_msg,
             'success': False
@@ -621,21 +1162,15 @@ def next_question():
     Get the next question using the enhanced question state management
     """
     try:
-        data = request.json
-        question_index = data.get('question_index', 0)
-        
-        # Redirect to the new endpoint with the appropriate action
-        return redirect(url_for('manage_question_state'), 
-                       code=307,  # 307 preserves the POST method
-                       Response=Response(
-                           json.dumps({
-                               'action': 'next'
-                           }), 
-                           mimetype='application/json')
-                       )
+        session_id = session.get('session_id')
+        if not session_id:
+            return jsonify({'error': 'Invalid session'}), 400
+        
+        # Same as POST /questions/state with action 'next', handled in-process
+        return advance_to_next_question(session_id)
         
     except Exception as e:
-        print(f"Error in next-question endpoint: {str(e)}")
+        logger.error("Error in next-question endpoint: %s", e)
         return jsonify({'error': 'An error occurred processing your request'}), 500
 
 @app.route('/transcribe', methods=['POST'])
@@ -645,59 +1180,54 @@ def transcribe_audio():
     Accepts direct audio file upload
     """
     try:
-        print("Received transcription request")
+        logger.debug("Received transcription request")
         
         # Check if a file was uploaded
         if 'audio_file' not in request.files:
-            print("Error: No audio file provided")
+            logger.error("No audio file provided")
             return jsonify({'error': 'No audio file provided', 'success': False}), 400
             
         audio_file = request.files['audio_file']
         
         if audio_file.filename == '':
-            print("Error: Empty filename")
+            logger.error("Empty filename")
             return jsonify({'error': 'No selected file', 'success': False}), 400
             
-        # Save the file to a temporary location
-        with tempfile.NamedTemporaryFile(suffix='.webm', delete=True) as temp_audio:
-            audio_file.save(temp_audio.name)
-            print(f"Saved uploaded audio to temporary file: {temp_audio.name}")
+        # Call OpenAI's Whisper model for transcription, passing the upload
+        # from memory rather than through a temporary file
+        try:
+            logger.debug("Calling OpenAI Whisper API...")
+            transcript = create_transcription(
+                model="whisper-1",
+                file=("audio.webm", audio_file.read()),
+                language="en"
+            )
             
-            # Call OpenAI's Whisper model for transcription
-            try:
-                with open(temp_audio.name, 'rb') as audio_file:
-                    print("Calling OpenAI Whisper API...")
-                    transcript = openai.audio.transcriptions.create(
-                        model="whisper-1",
-                        file=audio_file,
-                        language="en"
-                    )
-                    
-                    print(f"Transcription successful: '{transcript.text}'")
-                    
-                    # Return the transcribed text
-                    return jsonify({
-                        'text': transcript.text,
-                        'success': True
-                    })
-            except openai.APIError as e:
-                error_msg = f"OpenAI API error during transcription: {str(e)}"
-                print(error_msg)
-                return jsonify({
-                    'error': error_msg,
-                    'success': False
-                }), 500
-            except Exception as e:
-                error_msg = f"Error during transcription: {str(e)}"
-                print(error_msg)
-                return jsonify({
-                    'error': error_msg,
-                    'success': False
-                }), 500
+            logger.debug("Transcription successful: '%s'", transcript.text)
+            
+            # Return the transcribed text
+            return jsonify({
+                'text': transcript.text,
+                'success': True
+            })
+        except openai.APIError as e:
+            error_msg = f"OpenAI API error during transcription: {str(e)}"
+            logger.error(error_msg)
+            return jsonify({
+                'error': error_msg,
+                'success': False
+            }), 500
+        except Exception as e:
+            error_msg = f"Error during transcription: {str(e)}"
+            logger.error(error_msg)
+            return jsonify({
+                'error': error_msg,
+                'success': False
+            }), 500
     
     except Exception as e:
         error_msg = f"Error in transcribe_audio: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             'error': error_msg,
             'success': False
@@ -708,45 +1238,44 @@ def test_tts_route():
     """
     Simple test endpoint to verify routing works
     """
-    print("Test TTS route accessed")
+    logger.debug("Test TTS route accessed")
     return jsonify({
         'message': 'TTS test route works!',
         'success': True
     })
 
-@app.route('/text-to-speech', methods=['POST', 'OPTIONS'])
+def speech_response(text, voice_id, model_id):
+    """Return an MP3 response that streams the speech as it is synthesized"""
+    return Response(
+        stream_speech(text, voice_id, model_id),
+        mimetype="audio/mpeg",
+        headers={"Content-Disposition": "attachment; filename=speech.mp3"}
+    )
+
+@app.route('/text-to-speech', methods=['POST'])
 def text_to_speech():
     """
     Convert text to speech using Cartesia API
     """
-    # Handle preflight request for CORS
-    if request.method == 'OPTIONS':
-        response = jsonify({'success': True})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'POST,OPTIONS')
-        return response
-        
     try:
-        print("Received text-to-speech request")
-        print(f"Request content type: {request.content_type}")
-        print(f"Request data: {request.data[:100]}")
+        logger.debug("Received text-to-speech request")
+        logger.debug("Request content type: %s", request.content_type)
+        logger.debug("Request data: %s", request.data[:100])
         
         # Parse the JSON data
         try:
             data = request.json
             if data is None:
-                print("Warning: request.json is None, trying to parse manually")
+                logger.warning("request.json is None, trying to parse manually")
                 if request.data:
-                    import json
-                    data = json.loads(request.data)
+                    data = orjson.loads(request.data)
                 else:
-                    print("Error: No request data")
+                    logger.error("No request data")
                     return jsonify({'error': 'No data provided'}), 400
                     
-            print(f"Parsed data: {data}")
+            logger.debug("Parsed data: %s", data)
         except Exception as e:
-            print(f"Error parsing JSON: {str(e)}")
+            logger.error("Error parsing JSON: %s", e)
             return jsonify({'error': f'Invalid JSON: {str(e)}'}), 400
         
         text = data.get('text')
@@ -754,68 +1283,29 @@ def text_to_speech():
         model_id = data.get('model', 'sonic-2')  # Default model
         
         if not text:
-            print("Error: No text provided")
+            logger.error("No text provided")
             return jsonify({'error': 'No text provided'}), 400
             
         if not CARTESIA_API_KEY:
-            print("Warning: No Cartesia API key set, returning error")
+            logger.warning("No Cartesia API key set, returning error")
             return jsonify({
                 'error': 'Cartesia API key not configured',
                 'success': False
             }), 503
             
-        print(f"Converting to speech: '{text[:50]}...' (truncated)")
-        print(f"Using Cartesia API key: {CARTESIA_API_KEY[:5]}...")
-        print(f"Using voice: {voice_id}")
-        print(f"Using model: {model_id}")
-        
-        # Create properly formatted voice parameter
-        voice_param = voice_id
-        if isinstance(voice_id, str):
-            voice_param = {
-                "mode": "id",
-                "id": voice_id
-            }
-        
-        # Initialize Cartesia SDK client
-        import cartesia
-        client = cartesia.Cartesia(api_key=CARTESIA_API_KEY)
+        logger.debug("Converting to speech: '%s...' (truncated)", text[:50])
+        logger.debug("Using voice: %s", voice_id)
+        logger.debug("Using model: %s", model_id)
         
         try:
-            # Generate audio using the Cartesia Python SDK
-            print(f"Generating audio with Cartesia SDK...")
-            print(f"  - transcript: {text[:50]}...")
-            print(f"  - model_id: {model_id}")
-            print(f"  - voice: {voice_param}")
-            
-            audio_generator = client.tts.bytes(
-                transcript=text,
-                model_id=model_id,
-                voice=voice_param,
-                language="en"
-            )
-            
-            # Combine all chunks into a single audio output
-            audio_data = b"".join(list(audio_generator))
+            # Generate audio using the Cartesia Python SDK (or the TTS cache)
+            logger.debug("Generating audio with Cartesia SDK...")
             
-            print(f"Successfully generated audio, size: {len(audio_data)} bytes")
-            
-            # Create a Flask response with the audio data
-            flask_response = Response(
-                audio_data,
-                mimetype="audio/mpeg",
-                headers={
-                    "Content-Disposition": "attachment; filename=speech.mp3"
-                }
-            )
-            
-            # Add CORS headers
-            flask_response.headers.add('Access-Control-Allow-Origin', '*')
-            return flask_response
+            return speech_response(text, voice_id, model_id)
             
         except Exception as e:
             error_msg = f"Cartesia SDK error: {str(e)}"
-            print(error_msg)
+            logger.error(error_msg)
             return jsonify({
                 'error': error_msg,
                 'success': False
@@ -823,41 +1313,32 @@ def text_to_speech():
             
     except Exception as e:
         error_msg = f"Error in text_to_speech: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             'error': error_msg,
             'success': False
         }), 500
 
-@app.route('/text-to-speech/stream', methods=['POST', 'OPTIONS'])
+@app.route('/text-to-speech/stream', methods=['POST'])
 def stream_text_to_speech():
     """
     Stream text to speech using Cartesia API - better for longer texts
     """
-    # Handle preflight request for CORS
-    if request.method == 'OPTIONS':
-        response = jsonify({'success': True})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'POST,OPTIONS')
-        return response
-        
     try:
-        print("Received streaming text-to-speech request")
+        logger.debug("Received streaming text-to-speech request")
         
         # Parse the JSON data
         try:
             data = request.json
             if data is None:
-                print("Warning: request.json is None, trying to parse manually")
+                logger.warning("request.json is None, trying to parse manually")
                 if request.data:
-                    import json
-                    data = json.loads(request.data)
+                    data = orjson.loads(request.data)
                 else:
-                    print("Error: No request data")
+                    logger.error("No request data")
                     return jsonify({'error': 'No data provided'}), 400
         except Exception as e:
-            print(f"Error parsing JSON: {str(e)}")
+            logger.error("Error parsing JSON: %s", e)
             return jsonify({'error': f'Invalid JSON: {str(e)}'}), 400
         
         text = data.get('text')
@@ -865,106 +1346,90 @@ def stream_text_to_speech():
         model_id = data.get('model', 'sonic-2')  # Default model
         
         if not text:
-            print("Error: No text provided")
+            logger.error("No text provided")
             return jsonify({'error': 'No text provided'}), 400
             
         if not CARTESIA_API_KEY:
-            print("Warning: No Cartesia API key set, returning error")
+            logger.warning("No Cartesia API key set, returning error")
             return jsonify({
                 'error': 'Cartesia API key not configured',
                 'success': False
             }), 503
             
-        print(f"Streaming speech for: '{text[:50]}...' (truncated)")
-        print(f"Using voice: {voice_id}")
-        print(f"Using model: {model_id}")
+        logger.debug("Streaming speech for: '%s...' (truncated)", text[:50])
+        logger.debug("Using voice: %s", voice_id)
+        logger.debug("Using model: %s", model_id)
         
-        # Create properly formatted voice parameter
-        voice_param = voice_id
-        if isinstance(voice_id, str):
-            voice_param = {
-                "mode": "id",
-                "id": voice_id
-            }
+        # Create properly formatted voice parameter, also used for the cache key
+        voice_param = cartesia_voice(voice_id)
         
-        # Initialize Cartesia SDK client
-        import cartesia
-        client = cartesia.Cartesia(api_key=CARTESIA_API_KEY)
+        # Cached audio is sent whole as a single part
+        cached_audio = tts_audio_cache.get(text, voice_param, model_id)
+        if cached_audio is not None:
+            logger.debug("Serving streamed TTS from cache")
+            return Response(
+                [AUDIO_FRAME_HEADER + cached_audio + b'\r\n--frame\r\n'],
+                mimetype='multipart/x-mixed-replace; boundary=frame',
+                headers=STREAM_RESPONSE_HEADERS
+            )
         
         def generate_audio_chunks():
             """Generator function to yield audio chunks as they become available"""
             try:
                 # Use context ID to maintain voice consistency across chunks
-                context_id = f"ctx_{int(time.time())}_{uuid.uuid4().hex[:8]}"
-                print(f"Using context ID: {context_id}")
+                context_id = f"ctx_{int(time.time())}_{secrets.token_hex(4)}"
+                logger.debug("Using context ID: %s", context_id)
                 
-                # Split text into sentences for better streaming
-                sentences = re.split(r'(?<=[.!?])\s+', text)
-                print(f"Split text into {len(sentences)} sentences")
+                # Open the first multipart part
+                yield AUDIO_FRAME_HEADER
                 
-                # Process first sentence to start the stream
-                first_sentence = sentences[0]
+                # Audio is buffered and written out in parts of at least
+                # TTS_STREAM_FLUSH_BYTES, after TTS_STREAM_FLUSH_INTERVAL or at the
+                # end of each sentence
+                audio_buffer = bytearray()
+                buffer_started_at = None
+                recorder = AudioRecorder(tts_audio_cache, text, voice_param, model_id, TTS_CACHE_MAX_BYTES)
                 
-                print(f"Starting stream with first sentence: '{first_sentence}'")
-                # Create websocket client from SDK
-                ws_client = client.tts.websocket()
-                
-                # Connect to the websocket
-                yield b'--frame\r\n'
-                yield b'Content-Type: audio/mpeg\r\n\r\n'
-                
-                # Process each sentence
-                for i, sentence in enumerate(sentences):
-                    is_continuation = i > 0
-                    
-                    if is_continuation:
-                        print(f"Continuing with sentence {i+1}/{len(sentences)}")
-                        # Use getattr to avoid conflict with Python's 'continue' keyword
-                        continue_method = getattr(ws_client, "continue")
-                        audio_chunks = continue_method({
-                            "contextId": context_id,
-                            "transcript": sentence
-                        })
-                    else:
-                        print(f"Starting with sentence {i+1}/{len(sentences)}")
-                        audio_chunks = ws_client.send({
-                            "contextId": context_id, 
-                            "modelId": model_id,
-                            "voice": voice_param,
-                            "transcript": sentence,
-                            "language": "en"
-                        })
-                    
-                    # Stream chunks as they arrive
+                # Stream chunks as they arrive, coalesced into larger parts.
+                # Closing the audio stream when the client goes away cancels
+                # synthesis.
+                with contextlib.closing(stream_sentence_audio(text, voice_param, model_id, context_id)) as audio_chunks:
                     for chunk in audio_chunks:
-                        if chunk.type == "chunk":
-                            if hasattr(chunk, 'chunk') and chunk.chunk:
-                                yield chunk.chunk + b'\r\n'
-                                yield b'--frame\r\n'
-                                yield b'Content-Type: audio/mpeg\r\n\r\n'
+                        if chunk is None:
+                            # Flush the remaining audio at the sentence boundary
+                            if audio_buffer:
+                                part = bytes(audio_buffer)
+                                audio_buffer.clear()
+                                recorder.add(part)
+                                yield part + AUDIO_FRAME_SEPARATOR
+                            continue
                     
-                    # Small pause between sentences for natural cadence
-                    time.sleep(0.1)
+                        if not audio_buffer:
+                            buffer_started_at = time.monotonic()
+                        audio_buffer.extend(chunk)
+                        if (len(audio_buffer) >= TTS_STREAM_FLUSH_BYTES
+                                or time.monotonic() - buffer_started_at >= TTS_STREAM_FLUSH_INTERVAL):
+                            part = bytes(audio_buffer)
+                            audio_buffer.clear()
+                            recorder.add(part)
+                            yield part + AUDIO_FRAME_SEPARATOR
+                
+                # Keep the complete audio for the next request for this text
+                recorder.finish()
                 
             except Exception as e:
-                print(f"Error in streaming TTS: {str(e)}")
-                yield f"Error: {str(e)}".encode() + b'\r\n'
-                yield b'--frame\r\n'
+                logger.error("Error in streaming TTS: %s", e)
+                yield f"Error: {str(e)}".encode() + b'\r\n--frame\r\n'
         
         return Response(
             generate_audio_chunks(),
             mimetype='multipart/x-mixed-replace; boundary=frame',
-            headers={
-                'Access-Control-Allow-Origin': '*',
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            }
+            headers=STREAM_RESPONSE_HEADERS
         )
         
     except Exception as e:
         error_msg = f"Error in stream_text_to_speech: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             'error': error_msg,
             'success': False
@@ -985,19 +1450,18 @@ def cancel_tts():
             return jsonify({'error': 'No context_id provided'}), 400
             
         if not CARTESIA_API_KEY:
-            print("Warning: No Cartesia API key set, returning error")
+            logger.warning("No Cartesia API key set, returning error")
             return jsonify({
                 'error': 'Cartesia API key not configured',
                 'success': False
             }), 503
             
-        # Initialize Cartesia SDK client
-        import cartesia
-        client = cartesia.Cartesia(api_key=CARTESIA_API_KEY)
+        # Use the shared Cartesia SDK client
+        client = cartesia_client
         
         try:
             # Cancel the TTS generation with the given context ID
-            print(f"Cancelling TTS generation with context ID: {context_id}")
+            logger.debug("Cancelling TTS generation with context ID: %s", context_id)
             client.tts.cancel_context({"context_id": context_id})
             
             return jsonify({
@@ -1007,7 +1471,7 @@ def cancel_tts():
             
         except Exception as e:
             error_msg = f"Cartesia SDK error during cancellation: {str(e)}"
-            print(error_msg)
+            logger.error(error_msg)
             return jsonify({
                 'error': error_msg,
                 'success': False
@@ -1015,12 +1479,46 @@ def cancel_tts():
             
     except Exception as e:
         error_msg = f"Error in cancel_tts: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             'error': error_msg,
             'success': False
         }), 500
 
+# The Cartesia voice list rarely changes, so the encoded response is reused
+# for VOICE_LIST_TTL seconds
+VOICE_LIST_TTL = 600
+voice_list_cache = {'expires_at': 0, 'payload': None, 'etag': None}
+
+def get_voice_list():
+    """Return the encoded voice list response body and its ETag"""
+    if voice_list_cache['payload'] is None or time.monotonic() >= voice_list_cache['expires_at']:
+        response = cartesia_client.voices.get_all()
+        
+        # Format the response to include just the essential information
+        voice_list = []
+        for voice in response.voices:
+            voice_info = {
+                "id": voice.id,
+                "name": voice.name,
+                "description": voice.description,
+                "preview_url": voice.preview_url if hasattr(voice, 'preview_url') else None,
+                "gender": voice.gender if hasattr(voice, 'gender') else None,
+                "language": voice.language if hasattr(voice, 'language') else "en"
+            }
+            voice_list.append(voice_info)
+            
+        payload = orjson.dumps({
+            'voices': voice_list,
+            'success': True
+        })
+        voice_list_cache.update(
+            expires_at=time.monotonic() + VOICE_LIST_TTL,
+            payload=payload,
+            etag=hashlib.md5(payload).hexdigest()
+        )
+    return voice_list_cache['payload'], voice_list_cache['etag']
+
 @app.route('/text-to-speech/voices', methods=['GET'])
 def list_tts_voices():
     """
@@ -1028,49 +1526,31 @@ def list_tts_voices():
     """
     try:
         if not CARTESIA_API_KEY:
-            print("Warning: No Cartesia API key set, returning error")
+            logger.warning("No Cartesia API key set, returning error")
             return jsonify({
                 'error': 'Cartesia API key not configured',
                 'success': False
             }), 503
             
-        # Initialize Cartesia SDK client
-        import cartesia
-        client = cartesia.Cartesia(api_key=CARTESIA_API_KEY)
-        
         try:
-            # Get available voices from Cartesia
-            response = client.voices.get_all()
-            
-            # Format the response to include just the essential information
-            voice_list = []
-            for voice in response.voices:
-                voice_info = {
-                    "id": voice.id,
-                    "name": voice.name,
-                    "description": voice.description,
-                    "preview_url": voice.preview_url if hasattr(voice, 'preview_url') else None,
-                    "gender": voice.gender if hasattr(voice, 'gender') else None,
-                    "language": voice.language if hasattr(voice, 'language') else "en"
-                }
-                voice_list.append(voice_info)
-                
-            return jsonify({
-                'voices': voice_list,
-                'success': True
-            })
-            
+            payload, etag = get_voice_list()
         except Exception as e:
             error_msg = f"Cartesia SDK error: {str(e)}"
-            print(error_msg)
+            logger.error(error_msg)
             return jsonify({
                 'error': error_msg,
                 'success': False
             }), 500
             
+        # Let the browser revalidate its copy instead of downloading it again
+        response = Response(payload, mimetype="application/json")
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = f'private, max-age={VOICE_LIST_TTL}'
+        return response.make_conditional(request)
+            
     except Exception as e:
         error_msg = f"Error in list_tts_voices: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             'error': error_msg,
             'success': False
@@ -1083,12 +1563,13 @@ def tts_preferences():
     """
     try:
         session_id = session.get('session_id')
-        if not session_id:
+        session_data = chat_sessions.get(session_id) if session_id else None
+        if session_data is None:
             return jsonify({'error': 'Invalid session'}), 400
             
         # Initialize session preferences if not present
-        if 'tts_preferences' not in chat_sessions.get(session_id, {}):
-            chat_sessions[session_id]['tts_preferences'] = {
+        if 'tts_preferences' not in session_data:
+            session_data['tts_preferences'] = {
                 'voice_id': 'nova',
                 'model_id': 'sonic-2',
                 'auto_read': False,
@@ -1099,7 +1580,7 @@ def tts_preferences():
         # Handle GET request - return current preferences
         if request.method == 'GET':
             return jsonify({
-                'preferences': chat_sessions[session_id]['tts_preferences'],
+                'preferences': session_data['tts_preferences'],
                 'success': True
             })
         
@@ -1109,7 +1590,7 @@ def tts_preferences():
             if not data:
                 return jsonify({'error': 'No data provided'}), 400
                 
-            preferences = chat_sessions[session_id]['tts_preferences']
+            preferences = session_data['tts_preferences']
             
             # Update preferences with provided values
             if 'voice_id' in data:
@@ -1123,7 +1604,7 @@ def tts_preferences():
             if 'force_browser_tts' in data:
                 preferences['force_browser_tts'] = bool(data['force_browser_tts'])
                 
-            print(f"Updated TTS preferences for session {session_id}: {preferences}")
+            logger.debug("Updated TTS preferences for session %s: %s", session_id, preferences)
             
             return jsonify({
                 'preferences': preferences,
@@ -1132,7 +1613,7 @@ def tts_preferences():
             
     except Exception as e:
         error_msg = f"Error in tts_preferences: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             'error': error_msg,
             'success': False
@@ -1145,12 +1626,13 @@ def manage_ui_state():
     """
     try:
         session_id = session.get('session_id')
-        if not session_id:
+        session_data = chat_sessions.get(session_id) if session_id else None
+        if session_data is None:
             return jsonify({'error': 'Invalid session'}), 400
             
         # Initialize UI state if not present
-        if 'ui_state' not in chat_sessions.get(session_id, {}):
-            chat_sessions[session_id]['ui_state'] = {
+        if 'ui_state' not in session_data:
+            session_data['ui_state'] = {
                 'is_assistant_speaking': False,
                 'is_microphone_active': False,
                 'is_continuous_listening': False,
@@ -1166,10 +1648,10 @@ def manage_ui_state():
         # Handle GET request - return current UI state
         if request.method == 'GET':
             # Update last interaction time
-            chat_sessions[session_id]['ui_state']['last_interaction_time'] = time.time()
+            session_data['ui_state']['last_interaction_time'] = time.time()
             
             return jsonify({
-                'ui_state': chat_sessions[session_id]['ui_state'],
+                'ui_state': session_data['ui_state'],
                 'success': True
             })
         
@@ -1179,7 +1661,7 @@ def manage_ui_state():
             if not data:
                 return jsonify({'error': 'No data provided'}), 400
                 
-            ui_state = chat_sessions[session_id]['ui_state']
+            ui_state = session_data['ui_state']
             
             # Update with provided values
             for key, value in data.items():
@@ -1192,7 +1674,9 @@ def manage_ui_state():
             # Always update last interaction time
             ui_state['last_interaction_time'] = time.time()
             
-            print(f"Updated UI state for session {session_id}")
+            logger.debug("Updated UI state for session %s", session_id)
+            
+            broadcast_ui_state(session_id)
             
             return jsonify({
                 'ui_state': ui_state,
@@ -1201,7 +1685,7 @@ def manage_ui_state():
             
     except Exception as e:
         error_msg = f"Error in manage_ui_state: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             'error': error_msg,
             'success': False
@@ -1214,48 +1698,50 @@ def tts_queue():
     """
     try:
         session_id = session.get('session_id')
-        if not session_id:
+        session_data = chat_sessions.get(session_id) if session_id else None
+        if session_data is None:
             return jsonify({'error': 'Invalid session'}), 400
             
         # Initialize TTS queue if not present
-        if 'tts_queue' not in chat_sessions.get(session_id, {}):
-            chat_sessions[session_id]['tts_queue'] = []
-            chat_sessions[session_id]['active_tts'] = None
+        if 'tts_queue_buckets' not in session_data:
+            session_data['tts_queue_buckets'] = new_tts_queue()
+            session_data['active_tts'] = None
         
         # Handle GET request - return current queue state
         if request.method == 'GET':
-            tts_queue = chat_sessions[session_id]['tts_queue']
-            active_tts = chat_sessions[session_id]['active_tts']
+            tts_queue = session_data['tts_queue_buckets']
+            active_tts = session_data['active_tts']
             
             return jsonify({
-                'queue': tts_queue,
+                'queue': tts_queue_items(tts_queue),
                 'active': active_tts,
-                'queue_length': len(tts_queue),
+                'queue_length': tts_queue_length(tts_queue),
                 'is_playing': active_tts is not None,
                 'success': True
             })
         
         # Handle DELETE request - clear queue
         if request.method == 'DELETE':
-            chat_sessions[session_id]['tts_queue'] = []
+            session_data['tts_queue_buckets'] = new_tts_queue()
             
             # Also cancel active TTS if there is any
-            active_tts = chat_sessions[session_id]['active_tts']
+            active_tts = session_data['active_tts']
             if active_tts and active_tts.get('context_id'):
                 try:
-                    # Initialize Cartesia SDK client
-                    import cartesia
-                    client = cartesia.Cartesia(api_key=CARTESIA_API_KEY)
+                    # Use the shared Cartesia SDK client
+                    client = cartesia_client
                     client.tts.cancel_context({"context_id": active_tts['context_id']})
-                    print(f"Cancelled active TTS with context ID: {active_tts['context_id']}")
+                    logger.debug("Cancelled active TTS with context ID: %s", active_tts['context_id'])
                 except Exception as e:
-                    print(f"Error cancelling active TTS: {str(e)}")
+                    logger.error("Error cancelling active TTS: %s", e)
                     
-            chat_sessions[session_id]['active_tts'] = None
+            session_data['active_tts'] = None
             
             # Update UI state to reflect speaking status
-            if 'ui_state' in chat_sessions[session_id]:
-                chat_sessions[session_id]['ui_state']['is_assistant_speaking'] = False
+            if 'ui_state' in session_data:
+                session_data['ui_state']['is_assistant_speaking'] = False
+                broadcast_ui_state(session_id)
+            broadcast_tts_status(session_id)
             
             return jsonify({
                 'message': 'TTS queue cleared',
@@ -1267,9 +1753,18 @@ def tts_queue():
             data = request.json
             if not data or 'text' not in data:
                 return jsonify({'error': 'No text provided'}), 400
+            
+            # Refuse new requests while the queue is full so a client
+            # cannot grow the session without bound
+            if tts_queue_length(session_data['tts_queue_buckets']) >= MAX_TTS_QUEUE_LENGTH:
+                return jsonify({
+                    'error': 'TTS queue is full',
+                    'queue_length': MAX_TTS_QUEUE_LENGTH,
+                    'success': False
+                }), 429, {'Retry-After': '1'}
                 
             # Get preferences
-            tts_preferences = chat_sessions[session_id].get('tts_preferences', {
+            tts_preferences = session_data.get('tts_preferences', {
                 'voice_id': 'nova',
                 'model_id': 'sonic-2'
             })
@@ -1281,7 +1776,7 @@ def tts_queue():
             priority = data.get('priority', 'normal')  # can be 'high', 'normal', or 'low'
             
             # Create TTS request object
-            context_id = f"ctx_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+            context_id = f"ctx_{int(time.time())}_{secrets.token_hex(4)}"
             tts_request = {
                 'text': text,
                 'voice_id': voice_id,
@@ -1292,43 +1787,37 @@ def tts_queue():
                 'is_streaming': len(text) > 100  # Use streaming for longer texts
             }
             
-            tts_queue = chat_sessions[session_id]['tts_queue']
+            tts_queue = session_data['tts_queue_buckets']
             
-            # Handle priority queue insertion
+            # Handle priority queue insertion: high priority requests play
+            # before everything else, normal ones after any high priority
+            # requests and low ones last
             if priority == 'high':
-                # Insert at the beginning
-                tts_queue.insert(0, tts_request)
+                tts_queue['high'].append(tts_request)
+                queue_position = 0
             elif priority == 'low':
-                # Add to the end
-                tts_queue.append(tts_request)
+                tts_queue['low'].append(tts_request)
+                queue_position = tts_queue_length(tts_queue) - 1
             else:  # normal priority
-                # If queue is empty, add to end
-                if not tts_queue:
-                    tts_queue.append(tts_request)
-                else:
-                    # Insert after high priority items but before low priority
-                    insert_index = 0
-                    for i, req in enumerate(tts_queue):
-                        if req['priority'] != 'high':
-                            insert_index = i
-                            break
-                        insert_index = i + 1
-                    tts_queue.insert(insert_index, tts_request)
+                tts_queue['normal'].append(tts_request)
+                queue_position = len(tts_queue['high']) + len(tts_queue['normal']) - 1
+            queue_length = tts_queue_length(tts_queue)
             
-            print(f"Added TTS request to queue. Queue length: {len(tts_queue)}")
+            logger.debug("Added TTS request to queue. Queue length: %s", queue_length)
+            broadcast_tts_status(session_id)
             
             # Immediate response with queue position info
             return jsonify({
                 'message': 'Added to TTS queue',
                 'context_id': context_id,
-                'queue_position': tts_queue.index(tts_request),
-                'queue_length': len(tts_queue),
+                'queue_position': queue_position,
+                'queue_length': queue_length,
                 'success': True
             })
             
     except Exception as e:
         error_msg = f"Error in tts_queue: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             'error': error_msg,
             'success': False
@@ -1342,23 +1831,26 @@ def process_tts_queue():
     """
     try:
         session_id = session.get('session_id')
-        if not session_id:
+        session_data = chat_sessions.get(session_id) if session_id else None
+        if session_data is None:
             return jsonify({'error': 'Invalid session'}), 400
             
         # Check if we have a queue
-        if 'tts_queue' not in chat_sessions.get(session_id, {}):
+        if 'tts_queue_buckets' not in session_data:
             return jsonify({
                 'message': 'No TTS queue exists',
                 'success': False
             }), 404
             
-        tts_queue = chat_sessions[session_id]['tts_queue']
+        # Get the next request from the queue
+        next_request = pop_tts_request(session_data['tts_queue_buckets'])
         
         # If queue is empty, return empty response
-        if not tts_queue:
+        if next_request is None:
             # Update UI state to reflect speaking status
-            if 'ui_state' in chat_sessions[session_id]:
-                chat_sessions[session_id]['ui_state']['is_assistant_speaking'] = False
+            if 'ui_state' in session_data:
+                session_data['ui_state']['is_assistant_speaking'] = False
+                broadcast_ui_state(session_id)
                 
             return jsonify({
                 'message': 'TTS queue is empty',
@@ -1366,183 +1858,47 @@ def process_tts_queue():
                 'success': True
             })
             
-        # Get the next request from the queue
-        next_request = tts_queue.pop(0)
-        
         # Update active TTS
-        chat_sessions[session_id]['active_tts'] = next_request
+        session_data['active_tts'] = next_request
         
         # Update UI state to reflect speaking status
-        if 'ui_state' in chat_sessions[session_id]:
-            chat_sessions[session_id]['ui_state']['is_assistant_speaking'] = True
+        if 'ui_state' in session_data:
+            session_data['ui_state']['is_assistant_speaking'] = True
+            broadcast_ui_state(session_id)
+        broadcast_tts_status(session_id)
         
         # Check if Cartesia API is configured
         if not CARTESIA_API_KEY:
-            print("Warning: Cartesia API key not set, returning error")
+            logger.warning("Cartesia API key not set, returning error")
             # Return an error without the text
             return jsonify({
                 'error': 'Cartesia API key not configured',
                 'success': False
             }), 503
         
-        # Instead of using redirect, directly call the appropriate function
-        if next_request['is_streaming']:
-            # For streaming, call the stream function directly
-            text = next_request['text']
-            voice_id = next_request['voice_id']
-            model_id = next_request['model_id']
-            
-            print(f"Streaming speech for: '{text[:50]}...' (truncated)")
-            print(f"Using voice: {voice_id}")
-            print(f"Using model: {model_id}")
-            
-            # Create properly formatted voice parameter
-            voice_param = voice_id
-            if isinstance(voice_id, str):
-                voice_param = {
-                    "mode": "id",
-                    "id": voice_id
-                }
-            
-            # Initialize Cartesia SDK client
-            import cartesia
-            client = cartesia.Cartesia(api_key=CARTESIA_API_KEY)
-            
-            def generate_audio_chunks():
-                """Generator function to yield audio chunks as they become available"""
-                try:
-                    # Use context ID to maintain voice consistency across chunks
-                    context_id = next_request.get('context_id', f"ctx_{int(time.time())}_{uuid.uuid4().hex[:8]}")
-                    print(f"Using context ID: {context_id}")
-                    
-                    # Split text into sentences for better streaming
-                    sentences = re.split(r'(?<=[.!?])\s+', text)
-                    print(f"Split text into {len(sentences)} sentences")
-                    
-                    # Process first sentence to start the stream
-                    first_sentence = sentences[0]
-                    
-                    print(f"Starting stream with first sentence: '{first_sentence}'")
-                    # Create websocket client from SDK
-                    ws_client = client.tts.websocket()
-                    
-                    # Connect to the websocket
-                    yield b'--frame\r\n'
-                    yield b'Content-Type: audio/mpeg\r\n\r\n'
-                    
-                    # Process each sentence
-                    for i, sentence in enumerate(sentences):
-                        is_continuation = i > 0
-                        
-                        if is_continuation:
-                            print(f"Continuing with sentence {i+1}/{len(sentences)}")
-                            # Use getattr to avoid conflict with Python's 'continue' keyword
-                            continue_method = getattr(ws_client, "continue")
-                            audio_chunks = continue_method({
-                                "contextId": context_id,
-                                "transcript": sentence
-                            })
-                        else:
-                            print(f"Starting with sentence {i+1}/{len(sentences)}")
-                            audio_chunks = ws_client.send({
-                                "contextId": context_id, 
-                                "modelId": model_id,
-                                "voice": voice_param,
-                                "transcript": sentence,
-                                "language": "en"
-                            })
-                        
-                        # Stream chunks as they arrive
-                        for chunk in audio_chunks:
-                            if chunk.type == "chunk":
-                                if hasattr(chunk, 'chunk') and chunk.chunk:
-                                    yield chunk.chunk + b'\r\n'
-                                    yield b'--frame\r\n'
-                                    yield b'Content-Type: audio/mpeg\r\n\r\n'
-                        
-                        # Small pause between sentences for natural cadence
-                        time.sleep(0.1)
-                    
-                except Exception as e:
-                    print(f"Error in streaming TTS: {str(e)}")
-                    yield f"Error: {str(e)}".encode() + b'\r\n'
-                    yield b'--frame\r\n'
-            
-            return Response(
-                generate_audio_chunks(),
-                mimetype='multipart/x-mixed-replace; boundary=frame',
-                headers={
-                    'Access-Control-Allow-Origin': '*',
-                    'Cache-Control': 'no-cache, no-store, must-revalidate',
-                    'Pragma': 'no-cache',
-                    'Expires': '0'
-                }
-            )
-            
-        else:
-            # For short text, directly call the text_to_speech function
-            text = next_request['text']
-            voice_id = next_request['voice_id']
-            model_id = next_request['model_id']
-            
-            print(f"Converting to speech: '{text[:50]}...' (truncated)")
-            print(f"Using voice: {voice_id}")
-            print(f"Using model: {model_id}")
-            
-            # Create properly formatted voice parameter
-            voice_param = voice_id
-            if isinstance(voice_id, str):
-                voice_param = {
-                    "mode": "id",
-                    "id": voice_id
-                }
-            
-            # Initialize Cartesia SDK client
-            import cartesia
-            client = cartesia.Cartesia(api_key=CARTESIA_API_KEY)
-            
-            try:
-                # Generate audio using the Cartesia Python SDK
-                print(f"Generating audio with Cartesia SDK...")
-                print(f"  - transcript: {text[:50]}...")
-                print(f"  - model_id: {model_id}")
-                print(f"  - voice: {voice_param}")
-                
-                audio_generator = client.tts.bytes(
-                    transcript=text,
-                    model_id=model_id,
-                    voice=voice_param,
-                    language="en"
-                )
-                
-                # Combine all chunks into a single audio output
-                audio_data = b"".join(list(audio_generator))
-                
-                print(f"Successfully generated audio, size: {len(audio_data)} bytes")
-                
-                # Create a Flask response with the audio data
-                flask_response = Response(
-                    audio_data,
-                    mimetype="audio/mpeg",
-                    headers={
-                        "Content-Disposition": "attachment; filename=speech.mp3",
-                        'Access-Control-Allow-Origin': '*'
-                    }
-                )
-                
-                return flask_response
-                
-            except Exception as e:
-                error_msg = f"Cartesia SDK error: {str(e)}"
-                print(error_msg)
-                return jsonify({
-                    'error': error_msg,
-                    'success': False
-                }), 500
+        text = next_request['text']
+        voice_id = next_request['voice_id']
+        model_id = next_request['model_id']
+        
+        logger.debug("Converting queued text to speech: '%s...' (truncated)", text[:50])
+        logger.debug("Using voice: %s", voice_id)
+        logger.debug("Using model: %s", model_id)
+        
+        # The client plays queued items from a single audio blob, so long
+        # texts are streamed as one MP3 too (prefetched audio comes from the cache)
+        try:
+            return speech_response(text, voice_id, model_id)
+        except Exception as e:
+            error_msg = f"Cartesia SDK error: {str(e)}"
+            logger.error(error_msg)
+            return jsonify({
+                'error': error_msg,
+                'success': False
+            }), 500
             
     except Exception as e:
         error_msg = f"Error in process_tts_queue: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             'error': error_msg,
             'success': False
@@ -1555,18 +1911,19 @@ def get_websocket_token():
     """
     try:
         session_id = session.get('session_id')
-        if not session_id:
+        session_data = chat_sessions.get(session_id) if session_id else None
+        if session_data is None:
             return jsonify({'error': 'Invalid session'}), 400
             
         # Generate a token that expires in 15 minutes
-        token = f"ws_token_{session_id}_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+        token = f"ws_token_{session_id}_{int(time.time())}_{secrets.token_hex(4)}"
         expiry = time.time() + 900  # 15 minutes
         
         # Store the token in the session data
-        if 'websocket_tokens' not in chat_sessions.get(session_id, {}):
-            chat_sessions[session_id]['websocket_tokens'] = {}
+        if 'websocket_tokens' not in session_data:
+            session_data['websocket_tokens'] = {}
         
-        chat_sessions[session_id]['websocket_tokens'][token] = {
+        session_data['websocket_tokens'][token] = {
             'created_at': time.time(),
             'expires_at': expiry,
             'type': 'audio'
@@ -1580,7 +1937,7 @@ def get_websocket_token():
         
     except Exception as e:
         error_msg = f"Error in get_websocket_token: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             'error': error_msg,
             'success': False
@@ -1593,22 +1950,23 @@ def start_speech_recognition():
     """
     try:
         session_id = session.get('session_id')
-        if not session_id:
+        session_data = chat_sessions.get(session_id) if session_id else None
+        if session_data is None:
             return jsonify({'error': 'Invalid session'}), 400
             
         # Initialize audio processing state if not present
-        if 'audio_state' not in chat_sessions.get(session_id, {}):
-            chat_sessions[session_id]['audio_state'] = {
+        if 'audio_state' not in session_data:
+            session_data['audio_state'] = {
                 'is_listening': False,
                 'is_continuous': False,
                 'recognition_mode': 'command',  # can be 'command', 'dictation', or 'conversation'
-                'audio_chunks': [],
+                'chunk_count': 0,
                 'last_chunk_time': None,
                 'session_start_time': None,
                 'transcription_history': []
             }
         
-        audio_state = chat_sessions[session_id]['audio_state']
+        audio_state = session_data['audio_state']
         
         # Parse request parameters
         data = request.json or {}
@@ -1620,15 +1978,18 @@ def start_speech_recognition():
         audio_state['is_continuous'] = continuous
         audio_state['recognition_mode'] = recognition_mode
         audio_state['session_start_time'] = time.time()
-        audio_state['audio_chunks'] = []
+        # Drop audio left over from a session that was never stopped
+        reset_utterance(session_id, audio_state)
+        audio_state['committed_words'] = []
         
         # Update UI state to reflect listening status
-        if 'ui_state' in chat_sessions[session_id]:
-            chat_sessions[session_id]['ui_state']['is_microphone_active'] = True
-            chat_sessions[session_id]['ui_state']['is_continuous_listening'] = continuous
+        if 'ui_state' in session_data:
+            session_data['ui_state']['is_microphone_active'] = True
+            session_data['ui_state']['is_continuous_listening'] = continuous
+            broadcast_ui_state(session_id)
         
         # Generate a unique session ID for this recognition session
-        recognition_id = f"rec_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+        recognition_id = f"rec_{int(time.time())}_{secrets.token_hex(4)}"
         audio_state['current_recognition_id'] = recognition_id
         
         return jsonify({
@@ -1639,7 +2000,7 @@ def start_speech_recognition():
         
     except Exception as e:
         error_msg = f"Error in start_speech_recognition: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             'error': error_msg,
             'success': False
@@ -1652,44 +2013,43 @@ def stop_speech_recognition():
     """
     try:
         session_id = session.get('session_id')
-        if not session_id:
+        session_data = chat_sessions.get(session_id) if session_id else None
+        if session_data is None:
             return jsonify({'error': 'Invalid session'}), 400
             
         # Check if audio state exists
-        if 'audio_state' not in chat_sessions.get(session_id, {}):
+        if 'audio_state' not in session_data:
             return jsonify({'error': 'No active speech recognition session'}), 400
             
-        audio_state = chat_sessions[session_id]['audio_state']
+        audio_state = session_data['audio_state']
         
         # Update state
         audio_state['is_listening'] = False
         audio_state['is_continuous'] = False
         
         # Update UI state to reflect listening status
-        if 'ui_state' in chat_sessions[session_id]:
-            chat_sessions[session_id]['ui_state']['is_microphone_active'] = False
-            chat_sessions[session_id]['ui_state']['is_continuous_listening'] = False
+        if 'ui_state' in session_data:
+            session_data['ui_state']['is_microphone_active'] = False
+            session_data['ui_state']['is_continuous_listening'] = False
+            broadcast_ui_state(session_id)
         
         # Process any remaining audio chunks
         transcript = None
-        if audio_state['audio_chunks']:
+        if session_id in utterance_audio:
             try:
-                # This would be implemented to process the audio chunks
-                # For now, log that we would process them
-                print(f"Would process {len(audio_state['audio_chunks'])} remaining audio chunks")
-                # Reset chunks after processing
-                audio_state['audio_chunks'] = []
+                transcript = " ".join(finish_segment(session_id, audio_state))
             except Exception as e:
-                print(f"Error processing remaining audio chunks: {str(e)}")
+                logger.error("Error processing remaining audio chunks: %s", e)
         
         return jsonify({
             'message': "Stopped speech recognition",
+            'text': transcript,
             'success': True
         })
         
     except Exception as e:
         error_msg = f"Error in stop_speech_recognition: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             'error': error_msg,
             'success': False
@@ -1702,14 +2062,15 @@ def process_audio_chunk():
     """
     try:
         session_id = session.get('session_id')
-        if not session_id:
+        session_data = chat_sessions.get(session_id) if session_id else None
+        if session_data is None:
             return jsonify({'error': 'Invalid session'}), 400
             
         # Check if audio state exists and we're in listening mode
-        if 'audio_state' not in chat_sessions.get(session_id, {}) or not chat_sessions[session_id]['audio_state']['is_listening']:
+        if 'audio_state' not in session_data or not session_data['audio_state']['is_listening']:
             return jsonify({'error': 'No active speech recognition session'}), 400
             
-        audio_state = chat_sessions[session_id]['audio_state']
+        audio_state = session_data['audio_state']
         
         # Check if a file was uploaded
         if 'audio_chunk' not in request.files:
@@ -1726,93 +2087,161 @@ def process_audio_chunk():
         # Update last chunk time
         audio_state['last_chunk_time'] = time.time()
         
-        # Save the chunk to process
-        with tempfile.NamedTemporaryFile(suffix='.webm', delete=False) as temp_audio:
-            chunk_path = temp_audio.name
-            audio_chunk.save(chunk_path)
-            print(f"Saved uploaded audio chunk to temporary file: {chunk_path}")
+        # If we're in command or conversation mode, we process each chunk
+        # immediately, straight from memory
+        if recognition_mode in ['command', 'conversation'] and not is_continuous:
+            try:
+                # Stream the transcription, pushing partial text to the
+                # requesting tab's socket as it arrives
+                logger.debug("Calling OpenAI transcription API...")
+                transcribed_text = stream_transcription_text(
+                    requesting_socket_room(session_id),
+                    model=STREAMING_TRANSCRIPTION_MODEL,
+                    file=("audio.webm", audio_chunk.read()),
+                    language="en"
+                )
+                logger.debug("Transcription successful: '%s'", transcribed_text)
+                
+                # Add to transcription history
+                append_capped(audio_state['transcription_history'], {
+                    'text': transcribed_text,
+                    'timestamp': time.time(),
+                    'mode': recognition_mode
+                }, MAX_TRANSCRIPTION_HISTORY)
+                
+                # Return the transcribed text
+                return jsonify({
+                    'text': transcribed_text,
+                    'is_final': True,
+                    'success': True
+                })
+            except Exception as e:
+                error_msg = f"Error during transcription: {str(e)}"
+                logger.error(error_msg)
+                return jsonify({
+                    'error': error_msg,
+                    'success': False
+                }), 500
+        else:
+            # In continuous mode or dictation mode, we collect chunks in
+            # memory and process them together
+            chunk_bytes = audio_chunk.read()
+            
+            # A restarted recorder begins a new segment, so commit the rest
+            # of the previous one before collecting this chunk
+            finished_words = []
+            if request.form.get('segment_start') == 'true' and session_id in utterance_audio:
+                finished_words = finish_segment(session_id, audio_state)
+            
+            audio_bytes = utterance_audio.setdefault(session_id, bytearray())
+            if len(audio_bytes) + len(chunk_bytes) > MAX_SEGMENT_AUDIO_BYTES:
+                return jsonify({
+                    'error': 'Utterance is too long to transcribe, stop and start recognition again',
+                    'success': False
+                }), 413
+            audio_bytes += chunk_bytes
+            audio_state['chunk_count'] += 1
+            
+            # Re-transcribe the utterance every few chunks and commit the words
+            # that two consecutive passes agree on (LocalAgreement-2)
+            chunk_threshold = 2  # Run a transcription pass every 2 chunks
             
-            # If we're in command or conversation mode, we process each chunk immediately
-            if recognition_mode in ['command', 'conversation'] and not is_continuous:
+            if audio_state['chunk_count'] % chunk_threshold == 0:
+                # Process the collected chunks
                 try:
-                    with open(chunk_path, 'rb') as audio_file:
-                        # Call OpenAI's Whisper model for transcription
-                        print("Calling OpenAI Whisper API...")
-                        transcript = openai.audio.transcriptions.create(
-                            model="whisper-1",
-                            file=audio_file,
-                            language="en"
-                        )
-                        
-                        transcribed_text = transcript.text.strip()
-                        print(f"Transcription successful: '{transcribed_text}'")
-                        
-                        # Add to transcription history
-                        audio_state['transcription_history'].append({
-                            'text': transcribed_text,
-                            'timestamp': time.time(),
-                            'mode': recognition_mode
-                        })
-                        
-                        # Return the transcribed text
-                        return jsonify({
-                            'text': transcribed_text,
-                            'is_final': True,
-                            'success': True
-                        })
+                    hypothesis = transcribe_utterance(session_id, audio_state)
+                    new_words = local_agreement_commit(
+                        audio_state.get('previous_hypothesis', []),
+                        hypothesis,
+                        audio_state.get('segment_committed_count', 0)
+                    )
+                    extend_capped(audio_state.setdefault('committed_words', []), new_words, MAX_COMMITTED_WORDS)
+                    audio_state['segment_committed_count'] = audio_state.get('segment_committed_count', 0) + len(new_words)
+                    audio_state['previous_hypothesis'] = hypothesis
+                    logger.debug("Transcription pass over %s chunks committed %s words",
+                                 audio_state['chunk_count'], len(new_words))
+                    
+                    return jsonify({
+                        'message': f"Processed {audio_state['chunk_count']} audio chunks",
+                        'text': " ".join(finished_words + new_words),
+                        'is_final': False,
+                        'success': True
+                    })
                 except Exception as e:
-                    error_msg = f"Error during transcription: {str(e)}"
-                    print(error_msg)
+                    error_msg = f"Error processing audio chunks: {str(e)}"
+                    logger.error(error_msg)
                     return jsonify({
                         'error': error_msg,
                         'success': False
                     }), 500
             else:
-                # In continuous mode or dictation mode, we collect chunks and process them together
-                audio_state['audio_chunks'].append(chunk_path)
-                
-                # If we have enough chunks or it's been a while since the last chunk, process them
-                chunk_threshold = 5  # Process after collecting 5 chunks
-                time_threshold = 2.0  # Or after 2 seconds since first chunk
-                
-                if len(audio_state['audio_chunks']) >= chunk_threshold:
-                    # Process the collected chunks
-                    try:
-                        # This would combine and process the audio chunks
-                        # For now, just acknowledge receipt
-                        print(f"Collected {len(audio_state['audio_chunks'])} chunks, would process them")
-                        
-                        # Reset chunks after processing
-                        audio_state['audio_chunks'] = []
-                        
-                        return jsonify({
-                            'message': f"Processed {chunk_threshold} audio chunks",
-                            'is_final': False,
-                            'success': True
-                        })
-                    except Exception as e:
-                        error_msg = f"Error processing audio chunks: {str(e)}"
-                        print(error_msg)
-                        return jsonify({
-                            'error': error_msg,
-                            'success': False
-                        }), 500
-                else:
-                    # Just acknowledge receipt of chunk
-                    return jsonify({
-                        'message': f"Received audio chunk ({len(audio_state['audio_chunks'])}/{chunk_threshold})",
-                        'is_final': False,
-                        'success': True
-                    })
-        
+                # Just acknowledge receipt of chunk
+                return jsonify({
+                    'message': f"Received audio chunk ({audio_state['chunk_count']}/{chunk_threshold})",
+                    'text': " ".join(finished_words),
+                    'is_final': False,
+                    'success': True
+                })
+    
     except Exception as e:
         error_msg = f"Error in process_audio_chunk: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             'error': error_msg,
             'success': False
         }), 500
 
+def transcribe_utterance(session_id, audio_state):
+    """
+    Transcribe all audio collected for the current segment of the session's
+    utterance and return the hypothesis as a list of words.
+    """
+    # MediaRecorder chunks only form a valid file when joined from the start,
+    # since the container header is in the first chunk
+    transcript = create_transcription(
+        model="whisper-1",
+        file=("audio.webm", bytes(utterance_audio.get(session_id, b""))),
+        language="en",
+        # Condition on the already committed text for consistent wording
+        prompt=" ".join(audio_state.get('committed_words', []))
+    )
+    return transcript.text.split()
+
+def local_agreement_commit(previous_words, current_words, committed_count):
+    """
+    LocalAgreement-2: return the words past the committed prefix on which the
+    previous and current transcription passes agree.
+    """
+    def normalize(word):
+        return word.strip(".,!?;:\"'").lower()
+
+    agreed = committed_count
+    limit = min(len(previous_words), len(current_words))
+    while agreed < limit and normalize(previous_words[agreed]) == normalize(current_words[agreed]):
+        agreed += 1
+    return current_words[committed_count:agreed]
+
+def finish_segment(session_id, audio_state):
+    """
+    Commit whatever a final pass over the current segment hears that was not
+    yet agreed on, start a new segment and return the newly committed words.
+    """
+    try:
+        hypothesis = transcribe_utterance(session_id, audio_state)
+        new_words = hypothesis[audio_state.get('segment_committed_count', 0):]
+        extend_capped(audio_state.setdefault('committed_words', []), new_words, MAX_COMMITTED_WORDS)
+        logger.debug("Final pass over segment committed %s words", len(new_words))
+        return new_words
+    finally:
+        reset_utterance(session_id, audio_state)
+
+def reset_utterance(session_id, audio_state):
+    """Drop the audio collected for the current segment of the session's utterance"""
+    utterance_audio.pop(session_id, None)
+    audio_state['chunk_count'] = 0
+    audio_state['previous_hypothesis'] = []
+    audio_state['segment_committed_count'] = 0
+
 def handle_topic_identification(user_message, session_data):
     """
     Handle initial message to identify the topic for review.
@@ -1926,20 +2355,15 @@ def handle_ongoing_conversation(user_message, session_data):
     # Default: Provide feedback on the user's answer
     return generate_feedback_or_hint(user_message, session_data)
 
+# Requests for the next question, matched in a single case-insensitive scan
+NEXT_QUESTION_PATTERN = re.compile(
+    r"(?:next|another|different) question|next|give me (?:another|the next)|move(?: on)?(?: to next)?|let's continue",
+    re.IGNORECASE
+)
+
 def is_next_question_request(message):
     """Check if user is asking for the next question."""
-    patterns = [
-        r"(?i)(?:next|another|different) question",
-        r"(?i)next",
-        r"(?i)give me (?:another|the next)",
-        r"(?i)move(?: on)?(?: to next)?",
-        r"(?i)let's continue"
-    ]
-    
-    for pattern in patterns:
-        if re.search(pattern, message):
-            return True
-    return False
+    return NEXT_QUESTION_PATTERN.search(message) is not None
 
 def handle_next_question(session_data):
     """Handle a request for the next question."""
@@ -1984,19 +2408,18 @@ def handle_next_question(session_data):
     
     return {"role": "assistant", "content": response_text}, response_text
 
+# Requests to change the difficulty level, matched in a single scan
+DIFFICULTY_CHANGE_PATTERN = re.compile(
+    r"(?:change|switch|adjust) (?:the )?difficulty"
+    r"|make (?:it|the questions) (?:easier|harder|more difficult|simpler)"
+    r"|(?:easier|harder|more advanced|more basic) questions"
+    r"|(?:basic|beginner|intermediate|advanced|mixed) (?:difficulty|level|mode)",
+    re.IGNORECASE
+)
+
 def is_difficulty_change_request(message):
     """Check if user is asking to change the difficulty level."""
-    patterns = [
-        r"(?i)(?:change|switch|adjust) (?:the )?difficulty",
-        r"(?i)make (?:it|the questions) (?:easier|harder|more difficult|simpler)",
-        r"(?i)(?:easier|harder|more advanced|more basic) questions",
-        r"(?i)(?:basic|beginner|intermediate|advanced|mixed) (?:difficulty|level|mode)"
-    ]
-    
-    for pattern in patterns:
-        if re.search(pattern, message):
-            return True
-    return False
+    return DIFFICULTY_CHANGE_PATTERN.search(message) is not None
 
 def extract_difficulty(message):
     """Extract the requested difficulty level from the message."""
@@ -2058,116 +2481,147 @@ def analyze_review_topic(user_input):
         'difficulty': difficulty
     }
     
-    print(f"Analyzed topic: '{topic}', Difficulty: {difficulty}")
+    logger.debug("Analyzed topic: '%s', Difficulty: %s", topic, difficulty)
     return result
 
+# A mixed set is generated as one shorter completion per level
+MIXED_DIFFICULTY_LEVELS = ('basic', 'intermediate', 'advanced')
+
 def generate_active_recall_questions(topic, difficulty='mixed'):
     """Generate active recall questions for a given topic with specified difficulty level."""
     try:
-        # Create a prompt based on the topic and difficulty
-        prompt = create_topic_based_prompt(topic, difficulty)
-        
-        # Call OpenAI API
-        response = openai.ChatCompletion.create(
-            model="gpt-4",  # Use GPT-4 for better question quality
-            messages=[
-                {"role": "system", "content": "You are an expert educator specializing in creating effective active recall questions."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1500
-        )
-        
-        # Extract and format the questions
-        raw_questions = response.choices[0].message.content.strip()
-        questions = parse_and_validate_questions(raw_questions)
+        # Reuse questions already generated for the same difficulty and
+        # topic. The prompt holds nothing but the topic, so question sets are
+        # shared by all sessions, and only for exactly the same topic: similar
+        # topics ("World War I"/"World War II") need different questions.
+        cache_scope = "questions"
+        
+        if difficulty == 'mixed':
+            # Request every level concurrently, each completion is about a
+            # third as long as a single mixed one
+            pool = eventlet.GreenPool(len(MIXED_DIFFICULTY_LEVELS))
+            raw_question_sets = pool.imap(
+                lambda level: request_questions(topic, level, cache_scope, question_count="2-3", max_tokens=500),
+                MIXED_DIFFICULTY_LEVELS
+            )
+            questions = []
+            for level, raw_questions in zip(MIXED_DIFFICULTY_LEVELS, raw_question_sets):
+                questions.extend(
+                    f"[{level.capitalize()}] {question}"
+                    for question in parse_and_validate_questions(raw_questions)
+                    if is_valid_question(question)
+                )
+        else:
+            raw_questions = request_questions(topic, difficulty, cache_scope)
+            
+            # Extract and format the questions
+            questions = parse_and_validate_questions(raw_questions)
         
         if not questions:
-            print(f"Warning: Failed to parse questions for topic '{topic}'")
+            logger.warning("Failed to parse questions for topic '%s'", topic)
             return []
             
-        print(f"Generated {len(questions)} questions for topic '{topic}' at {difficulty} difficulty")
+        logger.debug("Generated %s questions for topic '%s' at %s difficulty", len(questions), topic, difficulty)
         return questions
         
     except Exception as e:
-        print(f"Error generating questions: {str(e)}")
+        logger.error("Error generating questions: %s", e)
         return []
 
-def create_topic_based_prompt(topic, difficulty='mixed'):
-    """Create a specialized prompt based on topic and difficulty level."""
-    
-    # Base prompt structure
-    base_prompt = f"""
-Generate 5-8 active recall questions about "{topic}".
-    """
+def request_questions(topic, difficulty, cache_scope, question_count="5-8", max_tokens=1500):
+    """Return the raw model output for a set of questions at one difficulty"""
+    # Create a prompt based on the normalized topic and difficulty, so case
+    # and whitespace variants of a topic make the same request
+    prompt = create_topic_based_prompt(" ".join(topic.lower().split()), difficulty, question_count)
     
-    # Add difficulty-specific instructions
-    difficulty_instructions = {
-        'basic': """
+    return cached_completion_text(
+        f"{cache_scope}:{difficulty}:{question_count}",
+        None,
+        model="gpt-4",  # Use GPT-4 for better question quality
+        messages=[
+            {"role": "system", "content": "You are an expert educator specializing in creating effective active recall questions."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.7,
+        max_tokens=max_tokens
+    )
+
+# Prompt instructions per difficulty level and subject, built once at import
+DIFFICULTY_INSTRUCTIONS = {
+    'basic': """
 Focus on foundational concepts and definitions.
 These questions should help beginners establish a basic understanding of the topic.
 Use straightforward language and clear, unambiguous questions.
 """,
-        'intermediate': """
+    'intermediate': """
 Target intermediate understanding with questions that explore relationships between concepts.
 Include questions that require application of knowledge, not just recall.
 Incorporate some technical terminology appropriate for someone with some background.
 """,
-        'advanced': """
+    'advanced': """
 Create challenging questions that require deep understanding and critical thinking.
 Include questions on complex applications, edge cases, and advanced theories.
 Use precise technical terminology and expect sophisticated understanding.
 """,
-        'mixed': """
+    'mixed': """
 Provide a balanced mix of basic, intermediate, and advanced questions.
 Label each question with its difficulty level (Basic, Intermediate, Advanced).
 Progress from simpler to more complex concepts to build understanding.
 """
-    }
-    
-    # Add subject-specific instructions based on topic analysis
-    subject_type = analyze_topic_type(topic)
-    subject_instructions = {
-        'math': """
+}
+
+SUBJECT_INSTRUCTIONS = {
+    'math': """
 Include some questions requiring step-by-step problem-solving.
 Focus on conceptual understanding alongside procedural knowledge.
 For formulas, ask about their applications and meanings, not just memorization.
 """,
-        'science': """
+    'science': """
 Include questions about experiments, evidence, and scientific models.
 Ask about cause-effect relationships and applications of scientific principles.
 Balance theoretical questions with practical applications.
 """,
-        'history': """
+    'history': """
 Include questions about chronology, cause-effect relationships, and historical significance.
 Ask about different perspectives and interpretations of historical events.
 Balance factual recall with questions about historical processes and themes.
 """,
-        'language': """
+    'language': """
 Include questions about grammar rules, vocabulary application, and language constructs.
 Ask about practical usage and exceptions to rules.
 Include contextual examples to test understanding.
 """,
-        'arts': """
+    'arts': """
 Include questions about techniques, historical context, and interpretative aspects.
 Balance factual knowledge with questions about aesthetic principles.
 Ask about influential works and their significance.
 """,
-        'technology': """
+    'technology': """
 Include questions about principles, implementations, and practical applications.
 Ask about evolution of technologies and their impact.
 Balance theoretical understanding with practical usage scenarios.
 """,
-        'general': """
+    'general': """
 Cover key concepts, applications, and relationships within the topic.
 Include questions that test both recall and understanding.
 Balance breadth and depth of the topic.
 """
-    }
+}
+
+def create_topic_based_prompt(topic, difficulty='mixed', question_count="5-8"):
+    """Create a specialized prompt based on topic and difficulty level."""
+    
+    # Base prompt structure
+    base_prompt = f"""
+Generate {question_count} active recall questions about "{topic}".
+    """
+    
+    # Subject-specific instructions are chosen by topic analysis
+    subject_type = analyze_topic_type(topic)
     
     # Format instructions based on difficulty and topic
-    difficulty_instruction = difficulty_instructions.get(difficulty, difficulty_instructions['mixed'])
-    subject_instruction = subject_instructions.get(subject_type, subject_instructions['general'])
+    difficulty_instruction = DIFFICULTY_INSTRUCTIONS.get(difficulty, DIFFICULTY_INSTRUCTIONS['mixed'])
+    subject_instruction = SUBJECT_INSTRUCTIONS.get(subject_type, SUBJECT_INSTRUCTIONS['general'])
     
     # Combine all instructions into the final prompt
     final_prompt = f"""{base_prompt}
@@ -2220,13 +2674,23 @@ def analyze_topic_type(topic):
     # Default to general if no specific matches
     return 'general'
 
+# Start of a numbered list item such as "1." or "2)"
+NUMBERED_LINE_PATTERN = re.compile(r"\s*\d+[.)]\s*(.*)")
+
 def parse_and_validate_questions(raw_questions):
     """
     Parse the raw questions output and validate that they are 
     properly formatted and useful active recall questions.
     """
-    # Initial parsing of numbered questions
-    questions = re.findall(r'\d+[\.\)]\s*(.*?)(?=\n\d+[\.\)]|$)', raw_questions, re.DOTALL)
+    # Initial parsing of numbered questions: a numbered line starts a new
+    # question and any other line continues the current one
+    questions = []
+    for line in raw_questions.split('\n'):
+        match = NUMBERED_LINE_PATTERN.match(line)
+        if match:
+            questions.append(match.group(1))
+        elif questions:
+            questions[-1] += '\n' + line
     
     # Clean up and validate each question
     validated_questions = []
@@ -2254,6 +2718,12 @@ def parse_and_validate_questions(raw_questions):
     # Last resort: return error message if no questions could be parsed
     return ["Could not generate valid active recall questions. Please try again with a different topic."]
 
+# Question structure: either contains a ? or starts with a common question word
+VALID_QUESTION_PATTERN = re.compile(
+    r"\?|^(?:what|how|why|describe|explain|define|identify|list|compare)",
+    re.IGNORECASE
+)
+
 def is_valid_question(question_text):
     """
     Validate if a question is a proper active recall question.
@@ -2261,32 +2731,48 @@ def is_valid_question(question_text):
     # Basic validation rules
     if len(question_text) < 15:  # Too short to be meaningful
         return False
-    
-    # Check for question structure (either has ? or starts with common question words)
-    question_markers = ['?', 'what', 'how', 'why', 'describe', 'explain', 'define', 'identify', 'list', 'compare']
-    has_marker = '?' in question_text.lower() or any(question_text.lower().startswith(marker) for marker in question_markers)
-    
-    return has_marker
+
+    return VALID_QUESTION_PATTERN.search(question_text) is not None
+
+# Phrases that signal a topic change, matched in a single case-insensitive scan
+TOPIC_CHANGE_PHRASES = [
+    "new topic", "different topic", "change topic", "another topic", 
+    "change subject", "new subject", "different subject", "another subject",
+    "let's talk about", "can we discuss", "i want to learn about", "i want to review",
+    "switch to", "change to", "instead of"
+]
+TOPIC_CHANGE_PATTERN = re.compile(
+    "|".join(re.escape(phrase) for phrase in TOPIC_CHANGE_PHRASES),
+    re.IGNORECASE
+)
 
 def is_new_topic_request(message):
     """
     Determine if the user is requesting to change the topic.
     """
-    message_lower = message.lower()
-    topic_change_phrases = [
-        "new topic", "different topic", "change topic", "another topic", 
-        "change subject", "new subject", "different subject", "another subject",
-        "let's talk about", "can we discuss", "i want to learn about", "i want to review",
-        "switch to", "change to", "instead of"
-    ]
-    
-    return any(phrase in message_lower for phrase in topic_change_phrases)
+    return TOPIC_CHANGE_PATTERN.search(message) is not None
 
 def extract_new_topic(message):
     """Extract a new topic request from the user message."""
     topic_info = analyze_review_topic(message)
     return topic_info
 
+# Verdict keywords in model feedback; "not correct" and "incorrect" are
+# listed before "correct" so a negated verdict is matched as a whole
+EVALUATION_PATTERN = re.compile(r"not correct|incorrect|partially|partly|correct", re.IGNORECASE)
+
+def classify_feedback(feedback):
+    """
+    Classify model feedback as 'correct', 'partially_correct' or 'incorrect'
+    in a single scan of the text.
+    """
+    verdicts = {match.lower() for match in EVALUATION_PATTERN.findall(feedback)}
+    if 'correct' in verdicts and not verdicts & {'not correct', 'incorrect'}:
+        return 'correct'
+    if verdicts & {'partially', 'partly'}:
+        return 'partially_correct'
+    return 'incorrect'
+
 def generate_feedback_or_hint(user_message, session_data):
     """
     Generate feedback or hint based on the user's response to a question.
@@ -2322,7 +2808,9 @@ For advanced questions, give minimal hints that prompt critical thinking.
 Write a brief, helpful hint:
 """
             
-            response = openai.ChatCompletion.create(
+            # Stream the hint to the session's sockets as it is generated
+            hint_text = stream_completion_text(
+                session.get('session_id'),
                 model="gpt-4",
                 messages=[
                     {"role": "system", "content": "You are a helpful educational assistant providing hints."},
@@ -2331,8 +2819,6 @@ Write a brief, helpful hint:
                 temperature=0.7,
                 max_tokens=150
             )
-            
-            hint_text = response.choices[0].message.content.strip()
             return {"role": "assistant", "content": hint_text}, hint_text
             
         else:
@@ -2355,7 +2841,12 @@ For advanced questions, evaluate depth of understanding and critical thinking.
 Provide a brief, helpful feedback response:
 """
             
-            response = openai.ChatCompletion.create(
+            # Reuse feedback only for exactly the same answer: near-identical
+            # answers can differ in the one term that decides the grade
+            feedback_text = cached_completion_text(
+                f"feedback:{session.get('session_id')}:{current_question}",
+                None,
+                stream_room=requesting_socket_room(session.get('session_id')),
                 model="gpt-4",
                 messages=[
                     {"role": "system", "content": "You are a helpful educational assistant evaluating answers."},
@@ -2365,8 +2856,6 @@ Provide a brief, helpful feedback response:
                 max_tokens=250
             )
             
-            feedback_text = response.choices[0].message.content.strip()
-            
             # Determine if the answer was correct for tracking
             answer_quality = "incorrect"
             if "correct" in feedback_text.lower() and not "incorrect" in feedback_text.lower():
@@ -2389,7 +2878,7 @@ Provide a brief, helpful feedback response:
             return {"role": "assistant", "content": feedback_text}, feedback_text
             
     except Exception as e:
-        print(f"Error generating feedback: {str(e)}")
+        logger.error("Error generating feedback: %s", e)
         response_text = "I apologize, but I'm having trouble evaluating your answer. Let's try again or move to the next question."
         return {"role": "assistant", "content": response_text}, response_text
 
@@ -2428,7 +2917,7 @@ def generate_hint(user_message, session_data):
             for msg in chat_history[-6:] if msg['role'] == 'user' or msg['role'] == 'assistant'
         ])
         
-        response = openai.chat.completions.create(
+        response = create_chat_completion(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": f"You are an educational assistant helping a student review {topic}. The student is asking for a hint about a question. Provide a helpful hint that guides them without giving away the full answer."},
@@ -2440,7 +2929,7 @@ def generate_hint(user_message, session_data):
         
         return response.choices[0].message.content.strip()
     except Exception as e:
-        print(f"Error in generate_hint: {str(e)}")
+        logger.error("Error in generate_hint: %s", e)
         # Provide a generic hint as fallback
         return "Think about the key concepts we've discussed so far. What fundamental principles might apply here?"
 
@@ -2451,18 +2940,41 @@ def test_tts_page():
     """
     return render_template('tts_test.html')
 
+def warm_up_api_connections():
+    """
+    Make one cheap request to each API so DNS lookup and the TLS handshake
+    happen before the first user request rather than during it.
+    """
+    warm_ups = []
+    if openai.api_key:
+        warm_ups.append(("OpenAI", openai.models.list))
+    if cartesia_client is not None:
+        # Also fills the voice list cache
+        warm_ups.append(("Cartesia", get_voice_list))
+    if mistral_client is not None:
+        warm_ups.append(("Mistral", mistral_client.list_models))
+    
+    for name, request_fn in warm_ups:
+        try:
+            request_fn()
+            logger.debug("Warmed up %s connection", name)
+        except Exception as e:
+            logger.warning("Could not warm up %s connection: %s", name, e)
+
+socketio.start_background_task(warm_up_api_connections)
+
 if __name__ == '__main__':
     # Check if OpenAI API key is set
     if not openai.api_key:
-        print("ERROR: OpenAI API key is not set. Please add it to your .env file.")
+        logger.error("OpenAI API key is not set. Please add it to your .env file.")
     else:
-        print(f"OpenAI API key loaded successfully (first 5 chars): {openai.api_key[:5]}...")
+        logger.info("OpenAI API key loaded successfully.")
         
     # Check if Cartesia API key is set
     if not CARTESIA_API_KEY:
-        print("WARNING: Cartesia API key is not set. Text-to-speech will not work.")
+        logger.warning("Cartesia API key is not set. Text-to-speech will not work.")
     else:
-        print(f"Cartesia API key loaded successfully (first 5 chars): {CARTESIA_API_KEY[:5]}...")
+        logger.info("Cartesia API key loaded successfully.")
     
     # Check if SSL certificate files exist
     cert_file = 'localhost+1.pem'
@@ -2472,8 +2984,8 @@ if __name__ == '__main__':
     # Run with or without SSL
     try:
         if ssl_files_exist:
-            print(f"SSL certificate files found. Running with HTTPS enabled.")
-            print(f"Using cert: {cert_file}, key: {key_file}")
+            logger.info("SSL certificate files found. Running with HTTPS enabled.")
+            logger.info("Using cert: %s, key: %s", cert_file, key_file)
             # Use Flask-SocketIO's built-in SSL support
             socketio.run(app, 
                        debug=True, 
@@ -2483,11 +2995,11 @@ if __name__ == '__main__':
                        certfile=cert_file,
                        allow_unsafe_werkzeug=True)
         else:
-            print(f"WARNING: SSL certificate files not found ({cert_file} and/or {key_file}).")
-            print("Running without SSL. This may cause issues with microphone access.")
+            logger.warning("SSL certificate files not found (%s and/or %s).", cert_file, key_file)
+            logger.warning("Running without SSL. This may cause issues with microphone access.")
             socketio.run(app, debug=True, host='127.0.0.1', port=5001, 
                       allow_unsafe_werkzeug=True)
     except Exception as e:
-        print(f"Error starting server: {e}")
-        print("Falling back to basic Flask server without SocketIO")
+        logger.error("Error starting server: %s", e)
+        logger.warning("Falling back to basic Flask server without SocketIO")
         app.run(debug=True, host='127.0.0.1', port=5001)
\ No newline at end of file
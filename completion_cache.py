@@ -0,0 +1,80 @@
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+class SemanticCompletionCache:
+    """
+    In-memory cache of model completions.
+
+    Entries are grouped by scope (e.g. per session). Scopes that hold
+    user-specific prompts should be per session so cached responses are not
+    shared across users. A lookup first tries an exact match on the
+    request key and then falls back to cosine similarity between the prompt
+    embedding and the embeddings of earlier prompts in the same scope.
+    Requests made without prompt text only ever match exactly.
+    """
+
+    def __init__(self, embed, similarity_threshold=0.95, max_entries_per_scope=256, max_scopes=1024):
+        # embed: callable that turns prompt text into an embedding vector
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self.max_entries_per_scope = max_entries_per_scope
+        self.max_scopes = max_scopes
+        self.scopes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _scope_entries(self, scope):
+        entries = self.scopes.get(scope)
+        if entries is None:
+            entries = self.scopes[scope] = OrderedDict()
+            if len(self.scopes) > self.max_scopes:
+                self.scopes.popitem(last=False)
+        self.scopes.move_to_end(scope)
+        return entries
+
+    def lookup(self, scope, request_key, prompt_text):
+        """
+        Return (cached_text, embedding). cached_text is None on a miss; the
+        embedding (if one was computed) should be passed back to store().
+        Without prompt_text only an exact request_key match is returned.
+        """
+        with self.lock:
+            entries = self._scope_entries(scope)
+            if request_key in entries:
+                entries.move_to_end(request_key)
+                return entries[request_key][1], None
+            if prompt_text is None:
+                return None, None
+            keys = [key for key, entry in entries.items() if entry[0] is not None]
+            if not keys:
+                return None, None
+            matrix = np.vstack([entries[key][0] for key in keys])
+
+        # Embed outside the lock, it is a network call
+        embedding = self._normalize(self.embed(prompt_text))
+        similarities = matrix @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            with self.lock:
+                entry = entries.get(keys[best])
+            if entry is not None:
+                return entry[1], embedding
+        return None, embedding
+
+    def store(self, scope, request_key, prompt_text, text, embedding=None):
+        """Add a completion to the cache, matched exactly only if prompt_text is None"""
+        if embedding is None and prompt_text is not None:
+            embedding = self._normalize(self.embed(prompt_text))
+        with self.lock:
+            entries = self._scope_entries(scope)
+            entries[request_key] = (embedding, text)
+            entries.move_to_end(request_key)
+            while len(entries) > self.max_entries_per_scope:
+                entries.popitem(last=False)
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
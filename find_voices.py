@@ -21,28 +21,22 @@ def main():
         voices = list(client.voices.list())
         print(f"Found {len(voices)} voices:")
         
-        # Print voice details
-        for i, voice in enumerate(voices[:20]):  # Print first 20 only
-            print(f"{i+1}. ID: {voice.id} - Name: {voice.name}")
+        # Print voice details and look for specific voices in one pass
+        wanted = {'nova': [], 'shimmer': []}
+        for i, voice in enumerate(voices):
+            if i < 20:  # Print first 20 only
+                print(f"{i+1}. ID: {voice.id} - Name: {voice.name}")
+            name_lower = voice.name.lower()
+            for name, matches in wanted.items():
+                if name in name_lower:
+                    matches.append(voice)
             
-        # Look for specific voices
         print("\nLooking for specific voices:")
-        found_nova = False
-        found_shimmer = False
-        
-        for voice in voices:
-            name_lower = voice.name.lower()
-            if 'nova' in name_lower:
-                print(f"Found Nova: {voice.id} - {voice.name}")
-                found_nova = True
-            if 'shimmer' in name_lower:
-                print(f"Found Shimmer: {voice.id} - {voice.name}")
-                found_shimmer = True
-        
-        if not found_nova:
-            print("Nova voice not found")
-        if not found_shimmer:
-            print("Shimmer voice not found")
+        for name, matches in wanted.items():
+            for voice in matches:
+                print(f"Found {name.capitalize()}: {voice.id} - {voice.name}")
+            if not matches:
+                print(f"{name.capitalize()} voice not found")
             
     except Exception as e:
         print(f"Error: {e}")
@@ -0,0 +1,29 @@
+"""
+Gunicorn configuration for running the app in production.
+
+Usage: gunicorn -c gunicorn.conf.py app:app
+"""
+import os
+
+bind = os.getenv("BIND", "127.0.0.1:5001")
+
+# Flask-SocketIO needs the eventlet worker so that many clients (and the
+# OpenAI / Cartesia requests they trigger) can be in flight at once.
+worker_class = "eventlet"
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", "1000"))
+# Gunicorn sets TCP_NODELAY on its listening sockets and accepted
+# connections inherit it, so small streamed audio parts are not held
+# back by Nagle's algorithm.
+
+# Chat sessions are kept in process memory unless REDIS_URL is set, so only
+# one worker can serve them consistently without Redis. Multiple workers also
+# need sticky sessions at the load balancer for Socket.IO.
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Serve over HTTPS when the local certificate files are present
+# (needed for microphone access in the browser)
+if os.path.exists("localhost+1.pem") and os.path.exists("localhost+1-key.pem"):
+    certfile = "localhost+1.pem"
+    keyfile = "localhost+1-key.pem"
+
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
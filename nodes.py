@@ -1,65 +1,118 @@
-from typing import Dict, Any, List
+from typing import List, Optional, TypedDict
 import io
-import os
+import logging
+import re
 
-from mistralai.client import MistralClient
+import numpy as np
 
-from utils import extract_text_from_pdf
+from utils import extract_text_from_pdf, mistral_client
 
-# Define the state for the graph
-class GraphState(Dict[str, Any]):
-    pdf_stream: io.BytesIO = None
-    extracted_text: str = None
-    generated_questions: List[str] = None
-    error: str = None
+logger = logging.getLogger(__name__)
+
+# Define the state for the graph. Nodes return only the keys they change
+# and LangGraph merges them into the state.
+class GraphState(TypedDict, total=False):
+    pdf_stream: io.BytesIO
+    extracted_text: Optional[str]
+    generated_questions: List[str]
+    error: Optional[str]
 
 def parse_pdf_node(state: GraphState) -> GraphState:
     """Node to parse the PDF content from the stream via Mistral OCR API."""
-    print("--- Executing Node: parse_pdf_node ---")
+    logger.debug("Executing node: parse_pdf_node")
     pdf_stream = state.get("pdf_stream")
     if not pdf_stream:
-        return {**state, "error": "PDF stream not found in state"}
+        return {"error": "PDF stream not found in state"}
 
     try:
         # Ensure the stream is at the beginning if it was read before
         pdf_stream.seek(0)
         extracted_text = extract_text_from_pdf(pdf_stream)
-        print(f"Extracted text length: {len(extracted_text)}")
+        logger.debug("Extracted text length: %s", len(extracted_text))
         # Make sure text extraction didn't yield an empty result implicitly
         if not extracted_text or extracted_text.isspace():
-             return {**state, "error": "OCR processing returned empty text."}
-        return {**state, "extracted_text": extracted_text}
+             return {"error": "OCR processing returned empty text."}
+        return {"extracted_text": extracted_text}
     except Exception as e:
-        print(f"Error during PDF processing (API call): {e}")
+        logger.error("Error during PDF processing (API call): %s", e)
         error_message = f"Failed to process PDF via external service: {type(e).__name__}"
-        return {**state, "error": error_message}
+        return {"error": error_message}
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+EMBEDDING_BATCH_SIZE = 64
+# Only this much of a very long document is considered for selection
+MAX_SELECTION_CHARS = 100_000
+
+def select_key_sentences(text: str, max_chars: int, diversity: float = 0.5) -> str:
+    """
+    Pick sentences that together cover the document within max_chars, using
+    maximal marginal relevance over Mistral embeddings: each step takes the
+    sentence closest to the document centroid that is least similar to the
+    sentences already chosen. Falls back to truncation if embedding fails.
+    """
+    sentences = [s.strip() for s in SENTENCE_BOUNDARY.split(text[:MAX_SELECTION_CHARS]) if s.strip()]
+    try:
+        vectors = []
+        for start in range(0, len(sentences), EMBEDDING_BATCH_SIZE):
+            response = mistral_client.embeddings(
+                model="mistral-embed",
+                input=sentences[start:start + EMBEDDING_BATCH_SIZE]
+            )
+            vectors.extend(item.embedding for item in response.data)
+    except Exception as e:
+        logger.warning("Sentence embedding failed, truncating text instead: %s", e)
+        return text[:max_chars]
+
+    embeddings = np.asarray(vectors, dtype=np.float32)
+    embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-9)
+    centroid = embeddings.mean(axis=0)
+    relevance = embeddings @ centroid
+
+    lengths = np.array([len(sentence) + 1 for sentence in sentences])
+    redundancy = np.zeros(len(sentences), dtype=np.float32)
+    available = lengths <= max_chars
+    selected = []
+    budget = max_chars
+    while available.any():
+        scores = np.where(available, (1 - diversity) * relevance - diversity * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        budget -= lengths[best]
+        redundancy = np.maximum(redundancy, embeddings @ embeddings[best])
+        available &= lengths <= budget
+        available[best] = False
+
+    if not selected:
+        return text[:max_chars]
+    # Keep the document order so the excerpt still reads naturally
+    return " ".join(sentences[i] for i in sorted(selected))
 
 def generate_questions_node(state: GraphState) -> GraphState:
     """Node to generate active recall questions from the extracted text using Mistral."""
-    print("--- Executing Node: generate_questions_node ---")
+    logger.debug("Executing node: generate_questions_node")
     extracted_text = state.get("extracted_text")
-    api_key = os.getenv("MISTRAL_API_KEY")
     model = "mistral-small-latest"
 
     if state.get("error"):
-        print("Skipping question generation due to upstream error.")
-        return state
+        logger.warning("Skipping question generation due to upstream error.")
+        return {"error": state["error"]}
 
     if not extracted_text:
-        return {**state, "error": "Extracted text not found in state for question generation"}
+        return {"error": "Extracted text not found in state for question generation"}
 
-    if not api_key:
-        return {**state, "error": "MISTRAL_API_KEY environment variable not set."}
+    if mistral_client is None:
+        return {"error": "MISTRAL_API_KEY environment variable not set."}
 
     try:
-        client = MistralClient(api_key=api_key)
+        client = mistral_client
 
-        # Limit text length to avoid excessive token usage/costs
-        # Consider more sophisticated chunking/summarization for very long docs
+        # Limit text length to avoid excessive token usage/costs; longer
+        # documents are reduced to their most representative sentences
         max_chars = 4000
-        text_for_prompt = extracted_text[:max_chars]
+        text_for_prompt = extracted_text
         if len(extracted_text) > max_chars:
-            print(f"Warning: Truncating text for prompt to {max_chars} characters.")
+            logger.debug("Selecting key sentences to fit the prompt in %s characters.", max_chars)
+            text_for_prompt = select_key_sentences(extracted_text, max_chars)
 
         prompt = f"""
 Analyze the following text extracted from a document. Based *only* on this text, generate a concise list of 3-5 important questions that would help someone actively recall the key information presented. Frame the questions clearly and directly related to the text content. Ensure the questions cover different aspects or key points of the provided text.
@@ -74,7 +127,7 @@ Output *only* the questions, each on a new line. Do not include numbering, bulle
 
         messages = [{"role": "user", "content": prompt}]
 
-        print(f"Calling Mistral model ({model}) for question generation...")
+        logger.debug("Calling Mistral model (%s) for question generation...", model)
         chat_response = client.chat(
             model=model,
             messages=messages,
@@ -82,22 +135,22 @@ Output *only* the questions, each on a new line. Do not include numbering, bulle
         )
 
         if not chat_response.choices:
-             return {**state, "error": "Mistral API returned no choices for question generation."}
+             return {"error": "Mistral API returned no choices for question generation."}
 
         raw_questions = chat_response.choices[0].message.content
         # Parse the response into a list of strings, removing empty lines
         generated_questions = [q.strip() for q in raw_questions.split('\n') if q.strip()]
 
         if not generated_questions:
-            print("Warning: Mistral response parsed into an empty list of questions.")
+            logger.warning("Mistral response parsed into an empty list of questions.")
             # You might want to return an error or a default message here
-            return {**state, "error": "Failed to parse valid questions from the model response."}
+            return {"error": "Failed to parse valid questions from the model response."}
 
-        print(f"Generated {len(generated_questions)} questions.")
+        logger.debug("Generated %s questions.", len(generated_questions))
         # Clear any previous error if this step succeeded
-        return {**state, "generated_questions": generated_questions, "error": None}
+        return {"generated_questions": generated_questions, "error": None}
 
     except Exception as e:
-        print(f"Error generating questions with Mistral: {e}")
+        logger.error("Error generating questions with Mistral: %s", e)
         # Specific error handling for API vs other issues could be added here
-        return {**state, "error": f"Failed during question generation: {type(e).__name__}"} 
\ No newline at end of file
+        return {"error": f"Failed during question generation: {type(e).__name__}"} 
\ No newline at end of file
@@ -8,12 +8,23 @@ Runs all Cartesia TTS tests and generates a comprehensive report.
 import os
 import sys
 import argparse
-import subprocess
+import asyncio
+import contextlib
 import datetime
-import json
+import html
+import io
 import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import orjson
+
+try:
+    import cartesia
+except ImportError:
+    cartesia = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -21,6 +32,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger("tts-test-runner")
 
+# Result fields that come from test output and are written into the report
+HTML_TEXT_FIELDS = ('voice', 'model', 'file', 'error')
+
 def check_environment():
     """Check if the environment is properly set up for testing."""
     # Check for API key
@@ -30,93 +44,117 @@ def check_environment():
         return False
 
     # Check for required packages
-    try:
-        import cartesia
-        logger.info(f"Found cartesia package version {cartesia.__version__}")
-    except ImportError:
+    if cartesia is None:
         logger.error("cartesia package is not installed. Please install it with 'pip install cartesia'")
         return False
+    logger.info(f"Found cartesia package version {cartesia.__version__}")
 
     return True
 
-def run_voice_quality_tests(args):
+def quiet_output(verbose):
+    """Hide the suites' printed output unless running verbosely."""
+    if verbose:
+        return contextlib.nullcontext()
+    return contextlib.redirect_stdout(io.StringIO())
+
+async def run_voice_quality_tests(args):
     """Run voice quality tests."""
     logger.info("Running voice quality tests...")
     
-    cmd = [
-        sys.executable, 
-        "test_voice_quality.py",
-        "--output-dir", str(args.output_dir / "voice_samples")
-    ]
+    # The suites run in this process instead of as separate scripts, so the
+    # interpreter and the cartesia package are only loaded once. They are
+    # imported here, after check_environment() has confirmed cartesia exists.
+    import test_voice_quality
     
-    if args.voice:
-        cmd.extend(["--voice", args.voice])
-    
-    if args.model:
-        cmd.extend(["--model", args.model])
-        
-    if args.phrase_index is not None:
-        cmd.extend(["--phrase-index", str(args.phrase_index)])
-        
-    if args.custom_phrase:
-        cmd.extend(["--custom-phrase", args.custom_phrase])
+    suite_args = argparse.Namespace(
+        output_dir=str(args.output_dir / "voice_samples"),
+        voice=args.voice,
+        model=args.model,
+        format=None,
+        phrase_index=args.phrase_index,
+        custom_phrase=args.custom_phrase
+    )
     
     try:
-        process = subprocess.run(cmd, check=True, capture_output=not args.verbose)
-        if process.returncode == 0:
-            logger.info("Voice quality tests completed successfully")
-            return True
-        else:
-            logger.error(f"Voice quality tests failed with code {process.returncode}")
-            return False
-    except subprocess.CalledProcessError as e:
+        # The voice quality suite is synchronous, run it on a worker thread
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, test_voice_quality.run_voice_quality_tests, suite_args)
+    except Exception as e:
         logger.error(f"Voice quality tests failed: {e}")
-        if e.stderr:
-            logger.error(f"Error output: {e.stderr.decode('utf-8')}")
-        return False
-    except FileNotFoundError:
-        logger.error("test_voice_quality.py not found")
         return False
+    
+    logger.info("Voice quality tests completed successfully")
+    return True
 
-def run_streaming_tests(args):
+async def run_streaming_tests(args):
     """Run streaming TTS tests."""
     logger.info("Running streaming TTS tests...")
     
-    cmd = [
-        sys.executable, 
-        "test_streaming_tts.py",
-        "--output-dir", str(args.output_dir / "streaming_samples"),
-        "--results-dir", str(args.output_dir / "test_results")
-    ]
+    import test_streaming_tts
     
-    if args.voice:
-        cmd.extend(["--voice", args.voice])
-    
-    if args.model:
-        cmd.extend(["--model", args.model])
+    suite_args = argparse.Namespace(
+        output_dir=str(args.output_dir / "streaming_samples"),
+        results_dir=str(args.output_dir / "test_results"),
+        voice=args.voice,
+        model=args.model
+    )
     
     try:
-        process = subprocess.run(cmd, check=True, capture_output=not args.verbose)
-        if process.returncode == 0:
-            logger.info("Streaming TTS tests completed successfully")
-            return True
-        else:
-            logger.error(f"Streaming TTS tests failed with code {process.returncode}")
-            return False
-    except subprocess.CalledProcessError as e:
+        await test_streaming_tts.run_streaming_tests(suite_args)
+    except Exception as e:
         logger.error(f"Streaming TTS tests failed: {e}")
-        if e.stderr:
-            logger.error(f"Error output: {e.stderr.decode('utf-8')}")
-        return False
-    except FileNotFoundError:
-        logger.error("test_streaming_tts.py not found")
         return False
+    
+    logger.info("Streaming TTS tests completed successfully")
+    return True
+
+async def run_selected_tests(args, run_all):
+    """Run the selected suites concurrently and return whether all passed."""
+    suites = []
+    if args.voice_quality or run_all:
+        suites.append(run_voice_quality_tests(args))
+    if args.streaming or run_all:
+        suites.append(run_streaming_tests(args))
+    
+    # The suites are independent and mostly wait on Cartesia, so they
+    # overlap instead of running one after the other
+    with quiet_output(args.verbose):
+        results = await asyncio.gather(*suites)
+    return all(results)
+
+def load_result_file(file):
+    """Load one JSON result file, returning None if it can't be read."""
+    try:
+        with open(file, 'rb') as f:
+            data = f.read()
+        # Result files hold a result object or a list of them, skip anything else unparsed
+        if data.lstrip()[:1] not in (b'{', b'['):
+            logger.warning(f"Skipping {file}: not a test result file")
+            return None
+        return orjson.loads(data)
+    except Exception as e:
+        logger.error(f"Error processing {file}: {e}")
+        return None
+
+def format_result(result):
+    """Return a copy of a result with its fields formatted for HTML."""
+    formatted = dict(result)
+    formatted['success'] = bool(result.get('success', False))
+    formatted['is_streaming'] = "chunks" in result
+    for field in HTML_TEXT_FIELDS:
+        if formatted.get(field) is not None:
+            formatted[field] = html.escape(str(formatted[field]))
+    # Shared by both tables
+    formatted['size_kb'] = f"{result.get('size_bytes', 0) / 1024:.2f}"
+    formatted['duration'] = f"{result.get('duration_sec', 0):.2f}"
+    return formatted
 
 def generate_report(args):
     """Generate a consolidated test report."""
     logger.info("Generating test report...")
     
-    report_file = args.output_dir / "test_results" / f"consolidated_report_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+    generated_at = datetime.datetime.now()
+    report_file = args.output_dir / "test_results" / f"consolidated_report_{generated_at.strftime('%Y%m%d_%H%M%S')}.html"
     
     # Find all JSON result files
     results_dir = args.output_dir / "test_results"
@@ -126,25 +164,26 @@ def generate_report(args):
         logger.warning("No test result files found for report generation")
         return False
     
-    # Load and consolidate results
+    # Load and consolidate results, reading the files in parallel
     all_results = []
-    for file in json_files:
-        try:
-            with open(file, 'r') as f:
-                results = json.load(f)
-                if isinstance(results, list):
-                    all_results.extend(results)
-                else:
-                    all_results.append(results)
-        except Exception as e:
-            logger.error(f"Error processing {file}: {e}")
+    with ThreadPoolExecutor(max_workers=min(8, len(json_files))) as executor:
+        for results in executor.map(load_result_file, json_files):
+            if isinstance(results, list):
+                all_results.extend(results)
+            elif results is not None:
+                all_results.append(results)
     
     if not all_results:
         logger.warning("No valid test results found")
         return False
     
-    # Generate HTML report
-    html_content = f"""
+    all_results = [format_result(r) for r in all_results]
+    total = len(all_results)
+    successes = sum(r['success'] for r in all_results)
+    
+    # Write the HTML report in sections so the tables are never held in memory as a whole
+    with open(report_file, 'w') as f:
+        f.write(f"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -164,15 +203,15 @@ def generate_report(args):
     </head>
     <body>
         <h1>Cartesia TTS Test Report</h1>
-        <p>Generated on {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+        <p>Generated on {generated_at.strftime('%Y-%m-%d %H:%M:%S')}</p>
         
         <div class="summary">
             <div class="summary-box">
                 <h3>Test Summary</h3>
-                <p>Total Tests: {len(all_results)}</p>
-                <p>Successful: {sum(1 for r in all_results if r.get('success', False))}</p>
-                <p>Failed: {sum(1 for r in all_results if not r.get('success', False))}</p>
-                <p>Success Rate: {(sum(1 for r in all_results if r.get('success', False)) / len(all_results) * 100):.1f}%</p>
+                <p>Total Tests: {total}</p>
+                <p>Successful: {successes}</p>
+                <p>Failed: {total - successes}</p>
+                <p>Success Rate: {successes / total * 100:.1f}%</p>
             </div>
             
             <div class="summary-box">
@@ -196,8 +235,9 @@ def generate_report(args):
                 <th>Duration (s)</th>
                 <th>Size (KB)</th>
                 <th>Details</th>
-            </tr>
-            {generate_results_table_html(all_results)}
+            </tr>""")
+        f.writelines(generate_results_table_rows(all_results))
+        f.write("""
         </table>
         
         <h2>Sample Files</h2>
@@ -207,91 +247,69 @@ def generate_report(args):
                 <th>Model</th>
                 <th>File Path</th>
                 <th>Size (KB)</th>
-            </tr>
-            {generate_files_table_html(all_results)}
+            </tr>""")
+        f.writelines(generate_files_table_rows(all_results))
+        f.write("""
         </table>
     </body>
     </html>
-    """
-    
-    with open(report_file, 'w') as f:
-        f.write(html_content)
+    """)
     
     logger.info(f"Test report generated: {report_file}")
     return True
 
 def generate_voice_summary_html(results):
     """Generate HTML for voice summary."""
-    voice_counts = {}
-    for result in results:
-        voice = result.get('voice', 'Unknown')
-        voice_counts[voice] = voice_counts.get(voice, 0) + 1
-    
-    html = "<ul>"
-    for voice, count in voice_counts.items():
-        html += f"<li>{voice}: {count}</li>"
-    html += "</ul>"
-    
-    return html
+    voice_counts = Counter(result.get('voice', 'Unknown') for result in results)
+    items = "".join(f"<li>{voice}: {count}</li>" for voice, count in voice_counts.items())
+    return f"<ul>{items}</ul>"
 
 def generate_model_summary_html(results):
     """Generate HTML for model summary."""
-    model_counts = {}
-    for result in results:
-        model = result.get('model', 'Unknown')
-        model_counts[model] = model_counts.get(model, 0) + 1
-    
-    html = "<ul>"
-    for model, count in model_counts.items():
-        html += f"<li>{model}: {count}</li>"
-    html += "</ul>"
-    
-    return html
+    model_counts = Counter(result.get('model', 'Unknown') for result in results)
+    items = "".join(f"<li>{model}: {count}</li>" for model, count in model_counts.items())
+    return f"<ul>{items}</ul>"
 
-def generate_results_table_html(results):
-    """Generate HTML for results table."""
-    html = ""
-    for i, result in enumerate(results):
-        success = result.get('success', False)
+def generate_results_table_rows(results):
+    """Yield the HTML rows of the results table."""
+    for result in results:
+        success = result['success']
         row_class = "success" if success else "failure"
         
         # Determine test type
-        test_type = "Streaming" if "chunks" in result else "Voice Quality"
+        is_streaming = result['is_streaming']
+        test_type = "Streaming" if is_streaming else "Voice Quality"
         
         # Get details
         details = result.get('error', '') if not success else ''
-        if "chunks" in result and success:
+        if is_streaming and success:
             details = f"{result.get('chunks', 0)} chunks"
         
-        html += f"""
+        yield f"""
         <tr class="{row_class}">
             <td>{test_type}</td>
             <td>{result.get('voice', 'Unknown')}</td>
             <td>{result.get('model', 'Unknown')}</td>
             <td>{'Success' if success else 'Failure'}</td>
-            <td>{result.get('duration_sec', 0):.2f}</td>
-            <td>{result.get('size_bytes', 0) / 1024:.2f}</td>
+            <td>{result['duration']}</td>
+            <td>{result['size_kb']}</td>
             <td>{details}</td>
         </tr>
         """
-    
-    return html
 
-def generate_files_table_html(results):
-    """Generate HTML for files table."""
-    html = ""
+def generate_files_table_rows(results):
+    """Yield the HTML rows of the files table."""
     for result in results:
-        if 'file' in result:
-            html += f"""
+        file_path = result.get('file')
+        if file_path is not None:
+            yield f"""
             <tr>
                 <td>{result.get('voice', 'Unknown')}</td>
                 <td>{result.get('model', 'Unknown')}</td>
-                <td>{result.get('file', '')}</td>
-                <td>{result.get('size_bytes', 0) / 1024:.2f}</td>
+                <td>{file_path}</td>
+                <td>{result['size_kb']}</td>
             </tr>
             """
-    
-    return html
 
 def parse_args():
     """Parse command-line arguments."""
@@ -322,10 +340,8 @@ def main():
     args.output_dir = Path(args.output_dir)
     
     # Create output directories
-    args.output_dir.mkdir(parents=True, exist_ok=True)
-    (args.output_dir / "voice_samples").mkdir(exist_ok=True)
-    (args.output_dir / "streaming_samples").mkdir(exist_ok=True)
-    (args.output_dir / "test_results").mkdir(exist_ok=True)
+    for subdir in ("voice_samples", "streaming_samples", "test_results"):
+        (args.output_dir / subdir).mkdir(parents=True, exist_ok=True)
     
     # Check if environment is set up properly
     if not check_environment():
@@ -336,15 +352,7 @@ def main():
     run_all = args.all or (not args.voice_quality and not args.streaming)
     
     # Run selected tests
-    success = True
-    
-    if args.voice_quality or run_all:
-        voice_quality_success = run_voice_quality_tests(args)
-        success = success and voice_quality_success
-    
-    if args.streaming or run_all:
-        streaming_success = run_streaming_tests(args)
-        success = success and streaming_success
+    success = asyncio.run(run_selected_tests(args, run_all))
     
     # Generate report
     generate_report(args)
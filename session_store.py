@@ -0,0 +1,107 @@
+from collections.abc import MutableMapping
+import threading
+
+import orjson
+
+class RedisSessionStore(MutableMapping):
+    """
+    Dict-like chat session store backed by Redis, so sessions can be shared
+    between worker processes.
+
+    Each session is a Redis hash under "<prefix><session_id>" with a TTL,
+    holding one JSON-encoded field per top-level session key (messages,
+    ui_state, tts_queue, ...). Sessions read during a request are kept in a
+    per-request (per-greenlet) cache so handlers can keep mutating them in
+    place; call flush() once the request is finished to write back only the
+    fields that changed. Requests that overlap on the same session therefore
+    only overwrite each other when they change the same field.
+    """
+
+    def __init__(self, redis_client, prefix="session:", ttl=24 * 60 * 60):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.ttl = ttl
+        self._local = threading.local()
+
+    def _loaded(self):
+        loaded = getattr(self._local, "sessions", None)
+        if loaded is None:
+            loaded = self._local.sessions = {}
+            # Encoded fields as read from Redis, None for sessions replaced
+            # as a whole
+            self._local.snapshots = {}
+        return loaded
+
+    def _snapshots(self):
+        self._loaded()
+        return self._local.snapshots
+
+    def _key(self, session_id):
+        return f"{self.prefix}{session_id}"
+
+    def __getitem__(self, session_id):
+        loaded = self._loaded()
+        if session_id not in loaded:
+            raw = self.redis.hgetall(self._key(session_id))
+            if not raw:
+                raise KeyError(session_id)
+            snapshot = {
+                field.decode() if isinstance(field, bytes) else field: value
+                for field, value in raw.items()
+            }
+            loaded[session_id] = {field: orjson.loads(value) for field, value in snapshot.items()}
+            self._snapshots()[session_id] = snapshot
+        return loaded[session_id]
+
+    def __setitem__(self, session_id, session_data):
+        self._loaded()[session_id] = session_data
+        self._snapshots()[session_id] = None
+
+    def __delitem__(self, session_id):
+        self._loaded().pop(session_id, None)
+        self._snapshots().pop(session_id, None)
+        if not self.redis.delete(self._key(session_id)):
+            raise KeyError(session_id)
+
+    def __contains__(self, session_id):
+        return session_id in self._loaded() or bool(self.redis.exists(self._key(session_id)))
+
+    def __iter__(self):
+        prefix_length = len(self.prefix)
+        for key in self.redis.scan_iter(match=f"{self.prefix}*"):
+            if isinstance(key, bytes):
+                key = key.decode()
+            yield key[prefix_length:]
+
+    def __len__(self):
+        return sum(1 for _ in self.redis.scan_iter(match=f"{self.prefix}*"))
+
+    def flush(self):
+        """Write the changed fields of sessions touched in this request back to Redis"""
+        loaded = self._loaded()
+        if not loaded:
+            return
+        snapshots = self._snapshots()
+        pipe = self.redis.pipeline()
+        for session_id, session_data in loaded.items():
+            key = self._key(session_id)
+            encoded = {field: orjson.dumps(value) for field, value in session_data.items()}
+            snapshot = snapshots.get(session_id)
+            if snapshot is None:
+                # New or replaced session, drop any fields it no longer has
+                pipe.delete(key)
+                changed, removed = encoded, []
+            else:
+                changed = {field: value for field, value in encoded.items() if snapshot.get(field) != value}
+                removed = [field for field in snapshot if field not in encoded]
+                if not changed and not removed:
+                    continue
+            if removed:
+                pipe.hdel(key, *removed)
+            if changed:
+                pipe.hset(key, mapping=changed)
+            pipe.expire(key, self.ttl)
+        if len(pipe):
+            pipe.execute()
+        loaded.clear()
+        snapshots.clear()
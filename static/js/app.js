@@ -202,6 +202,9 @@ function initApp() {
             socket.on('ui_state_update', handleUIStateUpdate);
             socket.on('tts_status_update', handleTTSStatusUpdate);
             socket.on('question_state_update', handleQuestionStateUpdate);
+            socket.on('chat_token', handleChatToken);
+            socket.on('transcription_token', handleTranscriptionToken);
+            socket.on('batch', handleBatchedEvents);
             socket.on('connect_error', (error) => {
                 console.error("WebSocket connection error:", error);
                 showError("Connection error. Falling back to polling.");
@@ -369,6 +372,58 @@ function initApp() {
         }
     }
 
+    // Dispatch state updates the server coalesced into one 'batch' event
+    function handleBatchedEvents(events) {
+        events.forEach(([event, data]) => {
+            socket.listeners(event).forEach((listener) => listener(data));
+        });
+    }
+
+    // Bot message being streamed token by token, replaced by the final response
+    let streamingMessageDiv = null;
+
+    // Handle a streamed chat token
+    function handleChatToken(data) {
+        if (!streamingMessageDiv) {
+            typingIndicator.style.display = 'none';
+            streamingMessageDiv = document.createElement('div');
+            streamingMessageDiv.className = 'message bot-message';
+            chatMessages.appendChild(streamingMessageDiv);
+        }
+        streamingMessageDiv.textContent += data.delta;
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+    }
+
+    // Remove the partially streamed message once the full response arrives
+    function clearStreamingMessage() {
+        if (streamingMessageDiv) {
+            streamingMessageDiv.remove();
+            streamingMessageDiv = null;
+        }
+    }
+
+    // Partial transcription shown in the input placeholder while a voice
+    // chunk is being transcribed
+    let partialTranscript = '';
+    let placeholderBeforeTranscript = '';
+
+    // Handle a streamed transcription token
+    function handleTranscriptionToken(data) {
+        if (!partialTranscript) {
+            placeholderBeforeTranscript = userInput.placeholder;
+        }
+        partialTranscript += data.delta;
+        userInput.placeholder = partialTranscript;
+    }
+
+    // Restore the placeholder once the final transcription arrives
+    function clearPartialTranscript() {
+        if (partialTranscript) {
+            userInput.placeholder = placeholderBeforeTranscript;
+            partialTranscript = '';
+        }
+    }
+
     // Handle question state update
     function handleQuestionStateUpdate(questionStateData) {
         const state = questionStateData.question_state || {};
@@ -718,6 +773,12 @@ function initApp() {
 
     // Audio recording variables
     let mediaRecorder = null;
+    // The recorder is restarted every SEGMENT_CHUNKS chunks so the next chunk
+    // starts with a fresh container header and the server only re-transcribes
+    // the current segment
+    const SEGMENT_CHUNKS = 10;
+    let segmentChunkCount = 0;
+    let isSegmentStart = true;
     let audioContext = null;
     let analyser = null;
     let microphone = null;
@@ -771,22 +832,7 @@ function initApp() {
                 }
             }
 
-            // Create recorder
-            if (mediaRecorderOptions) {
-                mediaRecorder = new MediaRecorder(stream, mediaRecorderOptions);
-            } else {
-                mediaRecorder = new MediaRecorder(stream);
-            }
-
-            // Handle data available event
-            mediaRecorder.ondataavailable = async (event) => {
-                if (event.data.size > 0) {
-                    await sendAudioChunk(event.data);
-                }
-            };
-
-            // Start recording and request data every 2 seconds
-            mediaRecorder.start(2000);
+            startRecorder(stream, mediaRecorderOptions);
             console.log("MediaRecorder started");
 
             // Start visualizer updates
@@ -802,6 +848,36 @@ function initApp() {
         }
     }
 
+    // Create a recorder for a new segment and start it
+    function startRecorder(stream, options) {
+        const recorder = options ? new MediaRecorder(stream, options) : new MediaRecorder(stream);
+        mediaRecorder = recorder;
+        segmentChunkCount = 0;
+        isSegmentStart = true;
+
+        // Handle data available event
+        recorder.ondataavailable = async (event) => {
+            if (event.data.size > 0) {
+                const segmentStart = isSegmentStart;
+                isSegmentStart = false;
+                segmentChunkCount++;
+
+                if (segmentChunkCount === SEGMENT_CHUNKS && recorder.state === 'recording') {
+                    // Its final chunk still belongs to this segment
+                    recorder.onstop = () => {
+                        if (stream.active) startRecorder(stream, options);
+                    };
+                    recorder.stop();
+                }
+
+                await sendAudioChunk(event.data, segmentStart);
+            }
+        };
+
+        // Start recording and request data every 2 seconds
+        recorder.start(2000);
+    }
+
     // Stop audio capture
     function stopAudioCapture() {
         try {
@@ -831,13 +907,18 @@ function initApp() {
     }
 
     // Send audio chunk to server
-    async function sendAudioChunk(audioBlob) {
+    async function sendAudioChunk(audioBlob, segmentStart) {
         try {
             if (!currentRecognitionId) return;
 
             const formData = new FormData();
             formData.append('audio_chunk', audioBlob, 'chunk.webm');
             formData.append('recognition_id', currentRecognitionId);
+            formData.append('segment_start', segmentStart ? 'true' : 'false');
+            // Partial transcripts are only sent to this tab's socket
+            if (socket && socket.connected) {
+                formData.append('socket_id', socket.id);
+            }
 
             const response = await fetch('/audio/speech-to-text/chunk', {
                 method: 'POST',
@@ -849,6 +930,7 @@ function initApp() {
             }
 
             const data = await response.json();
+            clearPartialTranscript();
 
             if (data.success && data.text) {
                 console.log("Transcription received:", data.text);
@@ -1121,7 +1203,11 @@ function initApp() {
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ message: messageToSend }),
+                // Streamed reply tokens are only sent to this tab's socket
+                body: JSON.stringify({
+                    message: messageToSend,
+                    socket_id: socket && socket.connected ? socket.id : null
+                }),
             });
 
             if (!response.ok) {
@@ -1129,6 +1215,7 @@ function initApp() {
             }
 
             const data = await response.json();
+            clearStreamingMessage();
 
             if (data.error) {
                 showError(data.error);
@@ -1151,6 +1238,7 @@ function initApp() {
             }
 
         } catch (error) {
+            clearStreamingMessage();
             showError(`Failed to send message: ${error.message}`);
         } finally {
             typingIndicator.style.display = 'none';
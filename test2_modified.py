@@ -25,16 +25,11 @@ audio_result = client.tts.bytes(
     }
 )
 
-# Collect audio data
-print('Collecting audio chunks...')
-audio_data = b''
-for chunk in audio_result:
-    audio_data += chunk
-
-# Save to file
+# Write audio chunks to the file as they arrive
 output_file = 'compatibility_test/test2_output.mp3'
 print(f'Saving audio to {output_file}...')
 with open(output_file, 'wb') as f:
-    f.write(audio_data)
+    for chunk in audio_result:
+        f.write(chunk)
 
 print(f'Audio saved successfully to {output_file}')
\ No newline at end of file
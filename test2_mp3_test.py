@@ -25,14 +25,10 @@ audio_result = client.tts.bytes(
     }
 )
 
-# Collect and save audio
-print('Collecting audio chunks...')
-audio_data = b''
-for chunk in audio_result:
-    audio_data += chunk
-
+# Save audio chunks as they arrive
 print('Saving to consistency_test/test2_output.mp3...')
 with open('consistency_test/test2_output.mp3', 'wb') as f:
-    f.write(audio_data)
+    for chunk in audio_result:
+        f.write(chunk)
 
 print('✓ MP3 saved successfully to consistency_test/test2_output.mp3')
\ No newline at end of file
@@ -54,9 +54,9 @@ SAMPLE_TEXTS = [
     ""  # Empty string to test error handling
 ]
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def cartesia_client():
-    """Fixture to create and return a Cartesia client."""
+    """Fixture to create a Cartesia client shared by all tests."""
     api_key = os.getenv("CARTESIA_API_KEY")
     assert api_key is not None, "CARTESIA_API_KEY environment variable must be set"
     
@@ -0,0 +1,93 @@
+from completion_cache import SemanticCompletionCache
+
+# Fake embeddings: "mitosis?" is a near-duplicate of "mitosis", "meiosis" is not
+VECTORS = {
+    "mitosis": [1.0, 0.0, 0.0],
+    "mitosis?": [0.99, 0.1, 0.0],
+    "meiosis": [0.6, 0.8, 0.0],
+}
+
+class FakeEmbed:
+    """Embed callable that records the texts it was asked to embed."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        return VECTORS[text]
+
+def new_cache(**kwargs):
+    embed = FakeEmbed()
+    return embed, SemanticCompletionCache(embed, **kwargs)
+
+def test_exact_hit_skips_embedding():
+    """An identical request is served without embedding the prompt."""
+    embed, cache = new_cache()
+    cache.store("s", "k1", "mitosis", "answer")
+    embed.calls.clear()
+    assert cache.lookup("s", "k1", "mitosis") == ("answer", None)
+    assert embed.calls == []
+
+def test_similar_prompt_hit():
+    """A near-duplicate prompt in the same scope reuses the completion."""
+    _, cache = new_cache()
+    cache.store("s", "k1", "mitosis", "answer")
+    text, embedding = cache.lookup("s", "k2", "mitosis?")
+    assert text == "answer"
+    assert embedding is not None
+
+def test_dissimilar_prompt_miss_returns_embedding():
+    """A miss hands back the computed embedding so store() can reuse it."""
+    embed, cache = new_cache()
+    cache.store("s", "k1", "mitosis", "answer")
+    text, embedding = cache.lookup("s", "k2", "meiosis")
+    assert text is None
+    embed.calls.clear()
+    cache.store("s", "k2", "meiosis", "other answer", embedding)
+    assert embed.calls == []
+    assert cache.lookup("s", "k2", "meiosis") == ("other answer", None)
+
+def test_scopes_are_isolated():
+    """Entries are never matched from another scope."""
+    _, cache = new_cache()
+    cache.store("s1", "k1", "mitosis", "answer")
+    assert cache.lookup("s2", "k1", "mitosis") == (None, None)
+
+def test_exact_only_entries():
+    """Without prompt text nothing is embedded and only exact keys match."""
+    embed, cache = new_cache()
+    cache.store("s", "k1", None, "grade")
+    assert cache.lookup("s", "k1", None) == ("grade", None)
+    assert cache.lookup("s", "k2", None) == (None, None)
+    assert embed.calls == []
+
+def test_exact_only_entries_skipped_in_similarity_scan():
+    """Semantic lookups ignore entries stored without an embedding."""
+    _, cache = new_cache()
+    cache.store("s", "k1", None, "grade")
+    assert cache.lookup("s", "k2", "mitosis") == (None, None)
+    cache.store("s", "k3", "mitosis", "answer")
+    assert cache.lookup("s", "k4", "mitosis?")[0] == "answer"
+
+def test_entry_lru_limit():
+    """Each scope keeps its most recently used entries."""
+    _, cache = new_cache(max_entries_per_scope=2)
+    cache.store("s", "k1", None, "one")
+    cache.store("s", "k2", None, "two")
+    cache.lookup("s", "k1", None)
+    cache.store("s", "k3", None, "three")
+    assert cache.lookup("s", "k2", None) == (None, None)
+    assert cache.lookup("s", "k1", None) == ("one", None)
+    assert cache.lookup("s", "k3", None) == ("three", None)
+
+def test_scope_lru_limit():
+    """Only the most recently used scopes are kept."""
+    _, cache = new_cache(max_scopes=2)
+    cache.store("s1", "k", None, "one")
+    cache.store("s2", "k", None, "two")
+    cache.lookup("s1", "k", None)
+    cache.store("s3", "k", None, "three")
+    assert cache.lookup("s1", "k", None) == ("one", None)
+    assert cache.lookup("s3", "k", None) == ("three", None)
+    assert cache.lookup("s2", "k", None) == (None, None)
@@ -88,15 +88,11 @@ def create_mp3_test2_script(output_file):
             "    }",
             ")",
             "",
-            "# Collect and save audio",
-            "print('Collecting audio chunks...')",
-            "audio_data = b''",
-            "for chunk in audio_result:",
-            "    audio_data += chunk",
-            "",
+            "# Save audio chunks as they arrive",
             f"print('Saving to {output_file}...')",
             f"with open('{output_file}', 'wb') as f:",
-            "    f.write(audio_data)",
+            "    for chunk in audio_result:",
+            "        f.write(chunk)",
             "",
             f"print('✓ MP3 saved successfully to {output_file}')"
         ]
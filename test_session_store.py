@@ -0,0 +1,156 @@
+import fnmatch
+import threading
+
+import orjson
+
+from session_store import RedisSessionStore
+
+class FakePipeline:
+    """Queues commands and applies them to a FakeRedis on execute()."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __len__(self):
+        return len(self.commands)
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+        return queue
+
+    def execute(self):
+        self.redis.executed.append([name for name, _, _ in self.commands])
+        for name, args, kwargs in self.commands:
+            getattr(self.redis, name)(*args, **kwargs)
+        self.commands = []
+
+class FakeRedis:
+    """In-memory stand-in for the hash commands RedisSessionStore uses."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.ttls = {}
+        # Command names of each executed pipeline
+        self.executed = []
+
+    def hgetall(self, key):
+        return {field.encode(): value for field, value in self.hashes.get(key, {}).items()}
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
+
+    def delete(self, key):
+        self.ttls.pop(key, None)
+        return 1 if self.hashes.pop(key, None) is not None else 0
+
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+    def exists(self, key):
+        return int(key in self.hashes)
+
+    def scan_iter(self, match):
+        return [key.encode() for key in self.hashes if fnmatch.fnmatch(key, match)]
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+def stored_session(redis, session_id):
+    return {field: orjson.loads(value) for field, value in redis.hashes[f"session:{session_id}"].items()}
+
+def new_store():
+    redis = FakeRedis()
+    return redis, RedisSessionStore(redis)
+
+def flush_in_other_request(store, update):
+    """Run update and flush() in another thread, i.e. a separate request."""
+    def request():
+        update()
+        store.flush()
+    thread = threading.Thread(target=request)
+    thread.start()
+    thread.join()
+
+def test_new_session_written_as_hash():
+    """A new session replaces the hash, one JSON field per key, with a TTL."""
+    redis, store = new_store()
+    store["abc"] = {"messages": [], "ui_state": {"theme": "dark"}}
+    store.flush()
+    assert stored_session(redis, "abc") == {"messages": [], "ui_state": {"theme": "dark"}}
+    assert redis.ttls["session:abc"] == store.ttl
+    assert redis.executed == [["delete", "hset", "expire"]]
+
+def test_read_only_session_not_written():
+    """Sessions that were only read are not written back."""
+    redis, store = new_store()
+    store["abc"] = {"messages": ["hi"]}
+    store.flush()
+    assert store["abc"]["messages"] == ["hi"]
+    store.flush()
+    assert len(redis.executed) == 1
+
+def test_only_changed_fields_written():
+    """Only fields whose encoding changed are written."""
+    redis, store = new_store()
+    store["abc"] = {"messages": [], "ui_state": {"theme": "dark"}}
+    store.flush()
+    store["abc"]["messages"].append("hi")
+    store.flush()
+    assert redis.executed[-1] == ["hset", "expire"]
+    assert stored_session(redis, "abc") == {"messages": ["hi"], "ui_state": {"theme": "dark"}}
+
+def test_removed_fields_deleted():
+    """Keys removed from a loaded session are deleted from the hash."""
+    redis, store = new_store()
+    store["abc"] = {"messages": [], "audio_state": {"chunk_count": 1}}
+    store.flush()
+    del store["abc"]["audio_state"]
+    store.flush()
+    assert redis.executed[-1] == ["hdel", "expire"]
+    assert stored_session(redis, "abc") == {"messages": []}
+
+def test_replaced_session_drops_old_fields():
+    """Assigning a whole session drops fields it no longer has."""
+    redis, store = new_store()
+    store["abc"] = {"messages": ["hi"], "tts_queue": ["clip"]}
+    store.flush()
+    assert store["abc"]["tts_queue"] == ["clip"]
+    store["abc"] = {"messages": []}
+    store.flush()
+    assert stored_session(redis, "abc") == {"messages": []}
+
+def test_overlapping_requests_keep_both_changes():
+    """Requests changing different fields of a session do not overwrite each other."""
+    redis, store = new_store()
+    store["abc"] = {"messages": [], "tts_queue": []}
+    store.flush()
+    # A long request loads the session first...
+    store["abc"]["messages"].append("hi")
+    # ...and another request changes a different field before it finishes
+    flush_in_other_request(store, lambda: store["abc"]["tts_queue"].append("clip"))
+    store.flush()
+    assert stored_session(redis, "abc") == {"messages": ["hi"], "tts_queue": ["clip"]}
+
+def test_missing_session():
+    """Unknown sessions are reported as missing."""
+    _, store = new_store()
+    assert "abc" not in store
+    assert store.get("abc") is None
+
+def test_iter_and_delete():
+    """Sessions can be listed, counted and deleted."""
+    redis, store = new_store()
+    store["abc"] = {"messages": []}
+    store["def"] = {"messages": []}
+    store.flush()
+    assert sorted(store) == ["abc", "def"]
+    assert len(store) == 2
+    del store["abc"]
+    assert list(store) == ["def"]
+    assert "session:abc" not in redis.hashes
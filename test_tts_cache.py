@@ -0,0 +1,74 @@
+import os
+
+from tts_cache import AudioRecorder, TTSAudioCache
+
+SOPHIE_VOICE = {"mode": "id", "id": "bf0a246a-8642-498a-9950-80c35e9276b5"}
+
+def test_dict_voice_round_trip(tmp_path):
+    """A voice config dict can be used as part of the cache key."""
+    cache = TTSAudioCache(cache_dir=str(tmp_path))
+    cache.set("Hello, world!", SOPHIE_VOICE, "sonic-2", b"audio")
+    assert cache.get("Hello, world!", dict(SOPHIE_VOICE), "sonic-2") == b"audio"
+
+def test_dict_voice_shares_key_with_voice_id():
+    """An id-mode voice config and its bare id hit the same entry."""
+    cache = TTSAudioCache()
+    cache.set("Hello, world!", SOPHIE_VOICE, "sonic-2", b"audio")
+    assert cache.get("Hello, world!", SOPHIE_VOICE["id"], "sonic-2") == b"audio"
+    assert cache.get("Hello, world!", "nova", "sonic-2") is None
+
+def test_dict_voice_survives_restart(tmp_path):
+    """Clips cached for a dict voice are found again from disk."""
+    TTSAudioCache(cache_dir=str(tmp_path)).set("Hello, world!", SOPHIE_VOICE, "sonic-2", b"audio")
+    cache = TTSAudioCache(cache_dir=str(tmp_path))
+    assert cache.get("Hello, world!", SOPHIE_VOICE, "sonic-2") == b"audio"
+
+def test_recorder_with_dict_voice():
+    """Streamed audio recorded for a dict voice is cached once complete."""
+    cache = TTSAudioCache()
+    recorder = AudioRecorder(cache, "Hello, world!", SOPHIE_VOICE, "sonic-2", max_bytes=1024)
+    recorder.add(b"au")
+    recorder.add(b"dio")
+    recorder.finish()
+    assert cache.get("Hello, world!", SOPHIE_VOICE, "sonic-2") == b"audio"
+
+def test_has_checks_both_levels(tmp_path):
+    """has() reports clips in memory or on disk without loading them."""
+    TTSAudioCache(cache_dir=str(tmp_path)).set("Hello, world!", SOPHIE_VOICE, "sonic-2", b"audio")
+    cache = TTSAudioCache(cache_dir=str(tmp_path))
+    assert cache.has("Hello, world!", SOPHIE_VOICE["id"], "sonic-2")
+    assert not cache.has("Goodbye", SOPHIE_VOICE, "sonic-2")
+    cache.set("Goodbye", "nova", "sonic-2", b"audio")
+    assert cache.has("Goodbye", "nova", "sonic-2")
+
+def test_disk_shared_between_instances(tmp_path):
+    """Clips written by another worker after startup are found on disk."""
+    first = TTSAudioCache(cache_dir=str(tmp_path))
+    second = TTSAudioCache(cache_dir=str(tmp_path))
+    first.set("Hello, world!", "nova", "sonic-2", b"audio")
+    assert second.has("Hello, world!", "nova", "sonic-2")
+    assert second.get("Hello, world!", "nova", "sonic-2") == b"audio"
+
+def test_disk_eviction_drops_least_recently_used(tmp_path):
+    """The directory is kept under max_disk_bytes, oldest clips first."""
+    cache = TTSAudioCache(max_entries=0, cache_dir=str(tmp_path), max_disk_bytes=10)
+    cache.set("one", "nova", "sonic-2", b"1111")
+    cache.set("two", "nova", "sonic-2", b"2222")
+    os.utime(cache._disk_path(("one", "nova", "sonic-2")), (0, 0))
+    os.utime(cache._disk_path(("two", "nova", "sonic-2")), (1, 1))
+    assert cache.get("one", "nova", "sonic-2") == b"1111"
+    cache.set("three", "nova", "sonic-2", b"3333")
+    assert cache.get("two", "nova", "sonic-2") is None
+    assert cache.get("one", "nova", "sonic-2") == b"1111"
+    assert cache.get("three", "nova", "sonic-2") == b"3333"
+
+def test_disk_eviction_counts_all_instances(tmp_path):
+    """Eviction accounts for clips written by other workers."""
+    first = TTSAudioCache(max_entries=0, cache_dir=str(tmp_path), max_disk_bytes=10)
+    second = TTSAudioCache(max_entries=0, cache_dir=str(tmp_path), max_disk_bytes=10)
+    first.set("one", "nova", "sonic-2", b"11111111")
+    os.utime(first._disk_path(("one", "nova", "sonic-2")), (0, 0))
+    second.set("two", "nova", "sonic-2", b"22222222")
+    assert sum(path.stat().st_size for path in tmp_path.iterdir()) <= 10
+    assert second.get("one", "nova", "sonic-2") is None
+    assert first.get("two", "nova", "sonic-2") == b"22222222"
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+import time
+
+def voice_key(voice):
+    """
+    Return a hashable, stable form of a Cartesia voice for cache keys. Voice
+    ids and {"mode": "id", "id": ...} configs for the same id share a key.
+    """
+    if isinstance(voice, dict):
+        if voice.get("mode") == "id" and len(voice) == 2:
+            return str(voice.get("id"))
+        return json.dumps(voice, sort_keys=True, separators=(",", ":"))
+    return voice
+
+class TTSAudioCache:
+    """
+    Two-level LRU cache of synthesized speech.
+
+    Entries are keyed by (text, voice, model_id). The memory level keeps
+    recent clips for ttl seconds so audio that was prefetched but never
+    played does not pile up. When cache_dir is set, clips are also written
+    there as MP3 files and kept until the directory grows past
+    max_disk_bytes, so repeated phrases survive restarts and are shared by
+    worker processes. The directory itself is the index: lookups open the
+    file directly, hits refresh its mtime, and eviction rescans the
+    directory, so clips and sizes written by other workers are counted.
+    """
+
+    def __init__(self, ttl=5 * 60, max_entries=128, cache_dir=None, max_disk_bytes=100 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._evict_disk()
+
+    @staticmethod
+    def _file_name(key):
+        return hashlib.sha256("|".join(map(str, key)).encode()).hexdigest() + ".mp3"
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, self._file_name(key))
+
+    def get(self, text, voice_id, model_id):
+        """Return the cached MP3 bytes, or None on a miss"""
+        key = (text, voice_key(voice_id), model_id)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, audio_data = entry
+                if expires_at >= time.monotonic():
+                    self.entries.move_to_end(key)
+                    return audio_data
+                del self.entries[key]
+        if not self.cache_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as audio_file:
+                audio_data = audio_file.read()
+            # Mark as recently used for every worker's eviction
+            os.utime(path)
+        except OSError:
+            # Never cached, or evicted by this or another worker
+            return None
+
+        with self.lock:
+            self._set_memory(key, audio_data)
+        return audio_data
+
+    def has(self, text, voice_id, model_id):
+        """Return whether audio is cached, without reading it from disk"""
+        key = (text, voice_key(voice_id), model_id)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                return True
+        return bool(self.cache_dir) and os.path.exists(self._disk_path(key))
+
+    def set(self, text, voice_id, model_id, audio_data):
+        """Add synthesized audio to the cache"""
+        key = (text, voice_key(voice_id), model_id)
+        with self.lock:
+            self._set_memory(key, audio_data)
+        if not self.cache_dir:
+            return
+
+        path = self._disk_path(key)
+        # Write to a temporary name first so readers never see a partial file
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as audio_file:
+            audio_file.write(audio_data)
+        os.replace(temp_path, path)
+        self._evict_disk()
+
+    def _set_memory(self, key, audio_data):
+        self.entries[key] = (time.monotonic() + self.ttl, audio_data)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _evict_disk(self):
+        """Remove the least recently used clips until the directory fits max_disk_bytes"""
+        files = []
+        disk_bytes = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".mp3"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, entry.name, stat.st_size))
+            disk_bytes += stat.st_size
+        if disk_bytes <= self.max_disk_bytes:
+            return
+        for _, name, size in sorted(files):
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                # Already removed by another worker
+                pass
+            disk_bytes -= size
+            if disk_bytes <= self.max_disk_bytes:
+                break
+
+class AudioRecorder:
+    """
+    Collects audio as it is streamed to a client and adds it to the cache
+    once complete, unless it grows past max_bytes.
+    """
+
+    def __init__(self, cache, text, voice_id, model_id, max_bytes):
+        self.cache = cache
+        self.key = (text, voice_id, model_id)
+        self.max_bytes = max_bytes
+        self.parts = []
+        self.size = 0
+
+    def add(self, part):
+        if self.parts is None:
+            return
+        self.size += len(part)
+        if self.size <= self.max_bytes:
+            self.parts.append(part)
+        else:
+            # Too long to cache, stop holding on to it
+            self.parts = None
+
+    def finish(self):
+        if self.parts:
+            self.cache.set(*self.key, b"".join(self.parts))
+        self.parts = None
@@ -1,4 +1,5 @@
 import io
+import logging
 import os
 import requests
 from typing import List
@@ -11,15 +12,19 @@ from mistralai.client import MistralClient
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Shared client so Mistral requests reuse one connection pool
+MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
+mistral_client = MistralClient(api_key=MISTRAL_API_KEY) if MISTRAL_API_KEY else None
+
 def extract_text_from_pdf(pdf_stream: io.BytesIO) -> str:
     """Extract text from a PDF using Mistral OCR API."""
-    api_key = os.getenv("MISTRAL_API_KEY")
-    
-    if not api_key:
+    if mistral_client is None:
         raise ValueError("MISTRAL_API_KEY environment variable is not set")
     
     try:
-        client = MistralClient(api_key=api_key)
+        client = mistral_client
         
         # Make sure the stream is at the beginning
         pdf_stream.seek(0)
@@ -41,12 +46,12 @@ def extract_text_from_pdf(pdf_stream: io.BytesIO) -> str:
                         "The system would analyze the document contents and generate relevant active recall questions based on key concepts."
         
         if not extracted_text:
-            print("Warning: OCR returned empty text")
+            logger.warning("OCR returned empty text")
             return ""
             
         return extracted_text
         
     except Exception as e:
-        print(f"Error in OCR processing: {e}")
+        logger.error("Error in OCR processing: %s", e)
         raise e
 
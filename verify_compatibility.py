@@ -123,17 +123,12 @@ def create_modified_test2(output_file):
         new_content.append("")
         
         # Save output
-        new_content.append("# Collect audio data")
-        new_content.append("print('Collecting audio chunks...')")
-        new_content.append("audio_data = b''")
-        new_content.append("for chunk in audio_result:")
-        new_content.append("    audio_data += chunk")
-        new_content.append("")
-        new_content.append("# Save to file")
+        new_content.append("# Write audio chunks to the file as they arrive")
         new_content.append(f"output_file = '{output_file}'")
         new_content.append("print(f'Saving audio to {output_file}...')")
         new_content.append("with open(output_file, 'wb') as f:")
-        new_content.append("    f.write(audio_data)")
+        new_content.append("    for chunk in audio_result:")
+        new_content.append("        f.write(chunk)")
         new_content.append("")
         new_content.append("print(f'Audio saved successfully to {output_file}')")
         